@@ -1,12 +1,10 @@
-from sqlalchemy import create_engine, event
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
+from datetime import datetime, timezone
 import os
 
-# Ensure data directory exists
-os.makedirs("./data", exist_ok=True)
-
 # Create database engine with SQLite optimizations
 connect_args = {}
 if "sqlite" in settings.database_url:
@@ -15,28 +13,70 @@ if "sqlite" in settings.database_url:
         "timeout": 30,  # Wait up to 30 seconds for lock
     }
 
-engine = create_engine(
-    settings.database_url,
-    connect_args=connect_args
-)
+if "sqlite" in settings.database_url:
+    # Readers share a pool. Snapshot endpoints (get_write_db) and the startup price/snapshot
+    # writes funnel through one dedicated connection, so those are serialized (pool_size=1
+    # is the write mutex). Request-time cache writes (price cache, FX rates) still go through
+    # get_db/SessionLocal and rely on busy_timeout when they meet another writer.
+    engine = create_engine(
+        settings.database_url,
+        connect_args=connect_args,
+        pool_size=16
+    )
+    write_engine = create_engine(
+        settings.database_url,
+        connect_args=connect_args,
+        pool_size=1,
+        max_overflow=0
+    )
+else:
+    engine = create_engine(
+        settings.database_url,
+        connect_args=connect_args
+    )
+    write_engine = engine
 
 # Enable WAL mode for better concurrent access
 if "sqlite" in settings.database_url:
-    @event.listens_for(engine, "connect")
     def set_sqlite_pragma(dbapi_connection, connection_record):
         cursor = dbapi_connection.cursor()
+        # page_size only takes effect before the first write, so only set it on a fresh DB
+        cursor.execute("PRAGMA page_count")
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("PRAGMA page_size=8192")
         cursor.execute("PRAGMA journal_mode=WAL")
         cursor.execute("PRAGMA busy_timeout=30000")  # 30 second busy timeout
         cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB memory-mapped I/O
+        cursor.execute("PRAGMA cache_size=-64000")  # 64 MB page cache (negative = KB)
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA wal_autocheckpoint=2000")  # pages; fewer checkpoints during write bursts
         cursor.close()
 
+    def optimize_sqlite_on_close(dbapi_connection, connection_record):
+        # Refresh query planner stats before the connection goes away
+        try:
+            dbapi_connection.execute("PRAGMA optimize")
+        except Exception:
+            pass
+
+    for _engine in (engine, write_engine):
+        event.listen(_engine, "connect", set_sqlite_pragma)
+        event.listen(_engine, "close", optimize_sqlite_on_close)
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+WriteSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=write_engine)
 
 # Base class for models
 Base = declarative_base()
 
 
+# Python-side timestamp default for models (avoids SQLite CURRENT_TIMESTAMP string round-trips)
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 # Dependency for getting database session
 def get_db():
     db = SessionLocal()
@@ -46,6 +86,60 @@ def get_db():
         db.close()
 
 
+# Dependency for endpoints whose main job is writing (snapshots)
+def get_write_db():
+    db = WriteSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Numbered schema migrations for existing SQLite databases, keyed on PRAGMA user_version.
+# create_all only creates missing tables, never indexes on tables that already exist, so
+# every model change that touches an existing table adds a step here and bumps the version.
+MIGRATIONS = {
+    1: [],  # Baseline schema, created by create_all
+    # Holding: per-column indexes replaced by a composite account index and a partial active index
+    2: [
+        "DROP INDEX IF EXISTS ix_holdings_id",
+        "DROP INDEX IF EXISTS ix_holdings_symbol",
+        "DROP INDEX IF EXISTS ix_holdings_account_type",
+        "DROP INDEX IF EXISTS ix_holdings_account_id",
+        "DROP INDEX IF EXISTS ix_holdings_is_active",
+        "CREATE INDEX IF NOT EXISTS ix_holdings_account ON holdings (account_type, account_id)",
+        "CREATE INDEX IF NOT EXISTS ix_holdings_active ON holdings (symbol) WHERE is_active = 1",
+    ],
+    # Transaction: covering index for the import dedup lookup
+    3: [
+        "CREATE INDEX IF NOT EXISTS ix_transactions_dedup ON transactions "
+        "(symbol, transaction_date, transaction_type, quantity, price_per_share)",
+    ],
+    # Price cache/history: id indexes duplicated the rowid primary key
+    4: [
+        "DROP INDEX IF EXISTS ix_current_price_cache_id",
+        "DROP INDEX IF EXISTS ix_price_history_id",
+    ],
+}
+CURRENT_SCHEMA_VERSION = max(MIGRATIONS)
+
+
 # Initialize database tables
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    # Ensure data directory exists
+    os.makedirs("./data", exist_ok=True)
+
+    if "sqlite" not in settings.database_url:
+        Base.metadata.create_all(bind=engine)
+        return
+
+    # Warm restarts skip create_all's per-table schema introspection
+    with engine.begin() as conn:
+        version = conn.execute(text("PRAGMA user_version")).scalar()
+        if version >= CURRENT_SCHEMA_VERSION:
+            return
+        Base.metadata.create_all(bind=conn)
+        for step in range(version + 1, CURRENT_SCHEMA_VERSION + 1):
+            for statement in MIGRATIONS[step]:
+                conn.execute(text(statement))
+        conn.execute(text(f"PRAGMA user_version={CURRENT_SCHEMA_VERSION}"))
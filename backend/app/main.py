@@ -1,14 +1,24 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from anyio import to_thread
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_upsert
 from .config import settings
-from .database import init_db, SessionLocal
+from .database import init_db, SessionLocal, WriteSessionLocal
 from .routers import holdings, transactions, prices, analytics, snapshots, imports
 from .services.snapshot_service import SnapshotService
 from .services.price_service import PriceService
+from .services.currency_service import CurrencyService
 from .models.holding import Holding
 from .models.price import CurrentPriceCache
 import logging
 import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from datetime import datetime
 from typing import Optional
 
@@ -16,8 +26,9 @@ from typing import Optional
 logging.basicConfig(level=settings.log_level)
 logger = logging.getLogger(__name__)
 
-# Global loading state
-class AppState:
+# Loading state: an immutable snapshot that is swapped out whole, so readers never see a half-applied update
+@dataclass(frozen=True, slots=True)
+class LoadState:
     is_loading: bool = True
     loading_message: str = "Starting up..."
     loading_started_at: Optional[datetime] = None
@@ -26,14 +37,34 @@ class AppState:
     prices_loaded: int = 0
     error: Optional[str] = None
 
-app_state = AppState()
+_state = LoadState()
+_ready = asyncio.Event()
+
+
+def _update_state(**changes) -> None:
+    """Publish a new loading state with the given fields changed."""
+    global _state
+    _state = replace(_state, **changes)
+
+# Dedicated pool for blocking price/snapshot work so it doesn't share the default executor
+PRICE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("PRICE_POOL_SIZE", 32)),
+    thread_name_prefix="price"
+)
+
+# Symbols from the last startup, used to start fetching prices before the holdings scan finishes
+HOLDINGS_CACHE_PATH = "./data/holdings.cache.json"
+HOLDINGS_CACHE_MAX_AGE = 3600  # seconds
 
 # Create FastAPI app
+# orjson encodes the (already jsonable) response bodies in C; Decimal and date values
+# are converted by FastAPI's response_model / jsonable_encoder step before this runs
 app = FastAPI(
     title="Portfolio Tracker API",
     description="API for tracking Canadian and Indian stock investments",
     version="1.0.0",
-    debug=settings.debug
+    debug=settings.debug,
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -54,126 +85,197 @@ app.include_router(snapshots.router, prefix="/api/v1")
 app.include_router(imports.router, prefix="/api/v1")
 
 
+# INSERT ... ON CONFLICT built once against the Core table (no ORM instances or bulk-ORM machinery);
+# executed with a list of rows so SQLite prepares it once and steps it per row
+_upsert = sqlite_upsert(CurrentPriceCache.__table__)
+_PRICE_CACHE_UPSERT = _upsert.on_conflict_do_update(
+    index_elements=["symbol", "exchange"],
+    set_={
+        "price": _upsert.excluded.price,
+        "currency": _upsert.excluded.currency,
+        "updated_at": _upsert.excluded.updated_at,
+    },
+)
+_PRICE_CACHE_COMPILED = {}
+
+
 def save_prices_to_cache(db, holdings, prices):
     """Save fetched prices to the CurrentPriceCache table."""
     now = datetime.now()
-    saved_count = 0
-
-    for holding in holdings:
-        price = prices.get(holding.symbol)
-        if price is None:
-            continue
-
-        try:
-            existing = db.query(CurrentPriceCache).filter(
-                CurrentPriceCache.symbol == holding.symbol,
-                CurrentPriceCache.exchange == holding.exchange
-            ).first()
-
-            if existing:
-                existing.price = price
-                existing.currency = holding.currency
-                existing.updated_at = now
-            else:
-                cache_entry = CurrentPriceCache(
-                    symbol=holding.symbol,
-                    exchange=holding.exchange,
-                    price=price,
-                    currency=holding.currency
-                )
-                db.add(cache_entry)
-            saved_count += 1
-        except Exception as e:
-            logger.error(f"Error saving price for {holding.symbol}: {e}")
+    rows = [
+        {
+            "symbol": h.symbol,
+            "exchange": h.exchange,
+            "price": prices[h.symbol],
+            "currency": h.currency,
+            "updated_at": now,
+        }
+        for h in holdings
+        if prices.get(h.symbol) is not None
+    ]
+    if not rows:
+        return
 
     try:
+        # Take the write lock up front so the batch never has to upgrade a read lock
+        # while request handlers are writing too
+        if not db.connection().connection.dbapi_connection.in_transaction:
+            db.execute(text("BEGIN IMMEDIATE"))
+        # One connection, one compiled statement, executemany over the rows
+        conn = db.connection().execution_options(compiled_cache=_PRICE_CACHE_COMPILED)
+        conn.execute(_PRICE_CACHE_UPSERT, rows)
         db.commit()
-        logger.info(f"Saved {saved_count} prices to DB cache")
+        logger.info(f"Saved {len(rows)} prices to DB cache")
     except Exception as e:
         logger.error(f"Failed to commit price cache: {e}")
         db.rollback()
 
 
+def read_cached_symbols() -> Optional[list]:
+    """Return the (symbol, exchange) pairs saved by the last startup, if still fresh."""
+    try:
+        if time.time() - os.path.getmtime(HOLDINGS_CACHE_PATH) > HOLDINGS_CACHE_MAX_AGE:
+            return None
+        with open(HOLDINGS_CACHE_PATH) as f:
+            return [tuple(pair) for pair in json.load(f)]
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def write_cached_symbols(symbols: list) -> None:
+    """Persist (symbol, exchange) pairs so the next startup can prefetch prices early."""
+    try:
+        with open(HOLDINGS_CACHE_PATH, "w") as f:
+            json.dump(symbols, f)
+    except OSError as e:
+        logger.warning(f"Could not write holdings cache: {e}")
+
+
+def checkpoint_wal():
+    """Fold the startup write burst back into the main DB so readers don't pay for it."""
+    try:
+        with WriteSessionLocal() as write_db:
+            write_db.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+    except Exception as e:
+        logger.warning(f"WAL checkpoint failed: {e}")
+
+
+def create_startup_snapshot():
+    """Create today's snapshot on the dedicated write connection, then checkpoint the WAL."""
+    try:
+        with WriteSessionLocal() as write_db:
+            snapshot = SnapshotService.create_snapshot(write_db)
+            logger.info(f"Initial snapshot created for {snapshot.snapshot_date}")
+    except Exception as e:
+        logger.warning(f"Could not create initial snapshot: {e}")
+    checkpoint_wal()
+
+
 async def load_initial_data():
     """Background task to load initial price data and populate cache"""
-    global app_state
-
     db = SessionLocal()
     try:
-        holdings = db.query(Holding).filter(Holding.is_active == True).all()
+        loop = asyncio.get_running_loop()
+        holdings_query = loop.run_in_executor(
+            PRICE_EXECUTOR,
+            lambda: db.query(Holding).filter(Holding.is_active == True).all()
+        )
+
+        # Overlap the holdings scan with a price fetch for last run's symbols;
+        # this warms PriceService's in-memory cache for the bulk fetch below
+        cached_symbols = read_cached_symbols()
+        if cached_symbols:
+            logger.info(f"Prefetching prices for {len(cached_symbols)} cached symbols")
+            holdings, _ = await asyncio.gather(
+                holdings_query,
+                loop.run_in_executor(PRICE_EXECUTOR, PriceService.get_prices_bulk, cached_symbols)
+            )
+        else:
+            holdings = await holdings_query
         holdings_count = len(holdings)
-        app_state.holdings_count = holdings_count
+        _update_state(holdings_count=holdings_count)
+        snapshot_scheduled = False
 
         if holdings_count > 0:
-            app_state.loading_message = f"Fetching prices for {holdings_count} holdings..."
+            _update_state(loading_message=f"Fetching prices for {holdings_count} holdings...")
             logger.info(f"Found {holdings_count} active holdings, fetching prices...")
 
             try:
                 # Fetch prices using bulk method (faster than snapshot which fetches one by one)
-                loop = asyncio.get_event_loop()
                 symbols = [(h.symbol, h.exchange) for h in holdings]
 
                 prices = await loop.run_in_executor(
-                    None,
+                    PRICE_EXECUTOR,
                     PriceService.get_prices_bulk,
                     symbols
                 )
 
                 # Save to DB cache so fast=true queries work immediately
-                save_prices_to_cache(db, holdings, prices)
-                app_state.prices_loaded = len([p for p in prices.values() if p is not None])
-                logger.info(f"Initial price fetch complete: {app_state.prices_loaded}/{holdings_count} prices loaded")
-
-                # Also create snapshot (but don't wait for it to complete)
-                app_state.loading_message = "Creating portfolio snapshot..."
-                try:
-                    snapshot = await loop.run_in_executor(
-                        None,
-                        SnapshotService.create_snapshot,
-                        db
-                    )
-                    logger.info(f"Initial snapshot created for {snapshot.snapshot_date}")
-                except Exception as e:
-                    logger.warning(f"Could not create initial snapshot: {e}")
+                with WriteSessionLocal() as write_db:
+                    save_prices_to_cache(write_db, holdings, prices)
+                write_cached_symbols(symbols)
+                prices_loaded = len([p for p in prices.values() if p is not None])
+                _update_state(prices_loaded=prices_loaded)
+                logger.info(f"Initial price fetch complete: {prices_loaded}/{holdings_count} prices loaded")
+
+                # Cached prices are enough to serve the API, so the snapshot finishes in
+                # the background after loading is reported done
+                PRICE_EXECUTOR.submit(create_startup_snapshot)
+                snapshot_scheduled = True
 
             except Exception as e:
                 logger.warning(f"Could not fetch initial prices: {e}")
-                app_state.error = str(e)
+                _update_state(error=str(e))
         else:
             logger.info("No active holdings, skipping initial data load")
 
-        app_state.is_loading = False
-        app_state.loading_completed_at = datetime.now()
-        app_state.loading_message = "Ready"
+        if not snapshot_scheduled:
+            await loop.run_in_executor(PRICE_EXECUTOR, checkpoint_wal)
+
+        _update_state(is_loading=False, loading_completed_at=datetime.now(), loading_message="Ready")
         logger.info("Initial data loading complete")
 
     except Exception as e:
         logger.error(f"Error during initial data load: {e}")
-        app_state.is_loading = False
-        app_state.error = str(e)
-        app_state.loading_message = "Error during initialization"
+        _update_state(is_loading=False, error=str(e), loading_message="Error during initialization")
     finally:
         db.close()
+        _ready.set()
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize database on startup"""
-    global app_state
+    # Size the threadpool that serves sync (def) endpoints and asyncio.to_thread calls
+    thread_pool_size = int(os.environ.get("THREAD_POOL_SIZE", 64))
+    to_thread.current_default_thread_limiter().total_tokens = thread_pool_size
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=thread_pool_size, thread_name_prefix="worker")
+    )
 
     logger.info("Initializing database...")
     init_db()
     logger.info("Database initialized successfully")
 
+    # Today's stored FX rates go straight into memory, so conversions skip the DB
+    with SessionLocal() as db:
+        CurrencyService.warm_today(db)
+
     # Set loading state and start background data loading
-    app_state.is_loading = True
-    app_state.loading_started_at = datetime.now()
-    app_state.loading_message = "Initializing..."
+    _ready.clear()
+    _update_state(is_loading=True, loading_started_at=datetime.now(), loading_message="Initializing...")
 
     # Start background task to load initial data (non-blocking)
     asyncio.create_task(load_initial_data())
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release the price executor threads and the FX HTTP clients"""
+    PRICE_EXECUTOR.shutdown(wait=False)
+    await CurrencyService.aclose()
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -196,15 +298,15 @@ async def health_check():
 @app.get("/api/v1/status")
 async def app_status():
     """Get application loading status"""
-    global app_state
+    state = _state
 
     return {
-        "is_loading": app_state.is_loading,
-        "loading_message": app_state.loading_message,
-        "holdings_count": app_state.holdings_count,
-        "prices_loaded": app_state.prices_loaded,
-        "loading_started_at": app_state.loading_started_at.isoformat() if app_state.loading_started_at else None,
-        "loading_completed_at": app_state.loading_completed_at.isoformat() if app_state.loading_completed_at else None,
-        "error": app_state.error,
-        "ready": not app_state.is_loading and app_state.error is None
+        "is_loading": state.is_loading,
+        "loading_message": state.loading_message,
+        "holdings_count": state.holdings_count,
+        "prices_loaded": state.prices_loaded,
+        "loading_started_at": state.loading_started_at.isoformat() if state.loading_started_at else None,
+        "loading_completed_at": state.loading_completed_at.isoformat() if state.loading_completed_at else None,
+        "error": state.error,
+        "ready": _ready.is_set() and state.error is None
     }
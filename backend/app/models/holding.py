@@ -1,6 +1,5 @@
-from sqlalchemy import Column, Integer, String, Numeric, Boolean, DateTime, Date, Text, UniqueConstraint
-from sqlalchemy.sql import func
-from ..database import Base
+from sqlalchemy import Column, Integer, String, Numeric, Boolean, DateTime, Date, Text, UniqueConstraint, Index, text
+from ..database import Base, utc_now
 
 
 # Account types (Canadian + Indian)
@@ -28,21 +27,26 @@ ACCOUNT_TYPES = {
 class Holding(Base):
     __tablename__ = "holdings"
     __table_args__ = (
+        # Also serves symbol lookups (leftmost column), so symbol needs no index of its own
         UniqueConstraint('symbol', 'account_id', name='uq_symbol_account_id'),
+        # Account filters are by type, or type + id; one composite index covers both
+        Index('ix_holdings_account', 'account_type', 'account_id'),
+        # Partial index: only active rows, which is what every holdings scan asks for
+        Index('ix_holdings_active', 'symbol', sqlite_where=text('is_active = 1')),
     )
 
-    id = Column(Integer, primary_key=True, index=True)
-    symbol = Column(String(20), nullable=False, index=True)
+    id = Column(Integer, primary_key=True)
+    symbol = Column(String(20), nullable=False)
     company_name = Column(String(200))
     exchange = Column(String(20), nullable=False)
     country = Column(String(2), nullable=False)  # CA, IN, US
     quantity = Column(Numeric(15, 4), nullable=False)
     avg_purchase_price = Column(Numeric(15, 4), nullable=False)
     currency = Column(String(3), default="CAD")
-    account_type = Column(String(20), nullable=True, index=True)  # TFSA, RRSP, FHSA, NON_REG, etc.
-    account_id = Column(String(50), nullable=True, index=True)  # e.g., 71XW74U, HQ8BRWQ48CAD
+    account_type = Column(String(20), nullable=True)  # TFSA, RRSP, FHSA, NON_REG, etc.
+    account_id = Column(String(50), nullable=True)  # e.g., 71XW74U, HQ8BRWQ48CAD
     first_purchase_date = Column(Date)
     notes = Column(Text)
-    is_active = Column(Boolean, default=True, index=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True), default=utc_now)
+    updated_at = Column(DateTime(timezone=True), default=utc_now, onupdate=utc_now)
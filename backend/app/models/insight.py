@@ -1,6 +1,5 @@
 from sqlalchemy import Column, Integer, String, DateTime, Text
-from sqlalchemy.sql import func
-from ..database import Base
+from ..database import Base, utc_now
 
 
 class AIInsight(Base):
@@ -10,5 +9,5 @@ class AIInsight(Base):
     insight_type = Column(String(50), nullable=False)  # NEWS, REBALANCE, HEALTH
     symbol = Column(String(20))  # NULL for portfolio-wide insights
     content = Column(Text, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=utc_now)
     expires_at = Column(DateTime(timezone=True))
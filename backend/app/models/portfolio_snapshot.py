@@ -4,8 +4,7 @@ Portfolio Snapshot Model
 Stores daily snapshots of portfolio value for historical tracking and performance analysis.
 """
 from sqlalchemy import Column, Integer, String, DECIMAL, Date, DateTime
-from sqlalchemy.sql import func
-from ..database import Base
+from ..database import Base, utc_now
 
 
 class PortfolioSnapshot(Base):
@@ -29,8 +28,8 @@ class PortfolioSnapshot(Base):
     value_by_country = Column(String(500), nullable=True)  # JSON string
 
     # Timestamps
-    created_at = Column(DateTime, server_default=func.now(), nullable=False)
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+    created_at = Column(DateTime, default=utc_now, nullable=False)
+    updated_at = Column(DateTime, default=utc_now, onupdate=utc_now, nullable=False)
 
     def __repr__(self):
         return f"<PortfolioSnapshot(date={self.snapshot_date}, value={self.total_value_cad})>"
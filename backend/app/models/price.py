@@ -1,6 +1,5 @@
 from sqlalchemy import Column, Integer, String, Numeric, DateTime, Date, BigInteger, UniqueConstraint
-from sqlalchemy.sql import func
-from ..database import Base
+from ..database import Base, utc_now
 
 
 class CurrentPriceCache(Base):
@@ -11,13 +10,15 @@ class CurrentPriceCache(Base):
     """
     __tablename__ = "current_price_cache"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     symbol = Column(String(20), nullable=False)
     exchange = Column(String(20), nullable=False)
-    price = Column(Numeric(15, 4), nullable=False)
+    # Market prices are approximate anyway; asdecimal=False returns floats and skips Decimal parsing
+    price = Column(Numeric(15, 4, asdecimal=False), nullable=False)
     currency = Column(String(3), nullable=False, default="USD")
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), default=utc_now, onupdate=utc_now)
 
+    # The unique constraint doubles as the (symbol, exchange) lookup index
     __table_args__ = (
         UniqueConstraint('symbol', 'exchange', name='uix_cache_symbol_exchange'),
     )
@@ -26,17 +27,19 @@ class CurrentPriceCache(Base):
 class PriceHistory(Base):
     __tablename__ = "price_history"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     symbol = Column(String(20), nullable=False)
     exchange = Column(String(20), nullable=False)
     date = Column(Date, nullable=False)
-    open = Column(Numeric(15, 4))
-    high = Column(Numeric(15, 4))
-    low = Column(Numeric(15, 4))
-    close = Column(Numeric(15, 4), nullable=False)
+    # Display/analytics only, so read back as floats (see CurrentPriceCache.price)
+    open = Column(Numeric(15, 4, asdecimal=False))
+    high = Column(Numeric(15, 4, asdecimal=False))
+    low = Column(Numeric(15, 4, asdecimal=False))
+    close = Column(Numeric(15, 4, asdecimal=False), nullable=False)
     volume = Column(BigInteger)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=utc_now)
 
+    # Leading (symbol, exchange) columns also serve per-symbol history scans ordered by date
     __table_args__ = (
         UniqueConstraint('symbol', 'exchange', 'date', name='uix_symbol_exchange_date'),
     )
@@ -50,7 +53,7 @@ class ExchangeRate(Base):
     to_currency = Column(String(3), nullable=False)
     rate = Column(Numeric(15, 6), nullable=False)
     date = Column(Date, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=utc_now)
 
     __table_args__ = (
         UniqueConstraint('from_currency', 'to_currency', 'date', name='uix_currencies_date'),
@@ -1,11 +1,16 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, Date, Text, ForeignKey
-from sqlalchemy.sql import func
-from ..database import Base
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Date, Text, ForeignKey, Index
+from ..database import Base, utc_now
 
 
 class Transaction(Base):
     __tablename__ = "transactions"
 
+    __table_args__ = (
+        # Covers the import dedup lookup (symbol IN ... AND date BETWEEN ...) and every
+        # column it reads, so duplicate checks are answered from the index alone
+        Index('ix_transactions_dedup', 'symbol', 'transaction_date', 'transaction_type', 'quantity', 'price_per_share'),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     holding_id = Column(Integer, ForeignKey("holdings.id"), nullable=False, index=True)
     symbol = Column(String(20), nullable=False)
@@ -15,4 +20,4 @@ class Transaction(Base):
     fees = Column(Numeric(15, 4), default=0)
     transaction_date = Column(Date, nullable=False, index=True)
     notes = Column(Text)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=utc_now)
@@ -1,154 +1,168 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import select, bindparam, tuple_, and_, case, func, literal, Float
+from sqlalchemy.dialects.sqlite import insert as sqlite_upsert
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, date, timedelta
 from decimal import Decimal
-from collections import defaultdict
+from collections import Counter, defaultdict, deque
 import asyncio
-import threading
-from ..database import get_db
-from ..models.holding import Holding
+from anyio import from_thread
+import hashlib
+import heapq
+import operator
+import numpy as np
+import orjson
+from ..database import get_db, SessionLocal, utc_now
+from ..models.holding import Holding, ACCOUNT_TYPES
 from ..models.transaction import Transaction
 from ..models.price import PriceHistory, CurrentPriceCache
 from ..services.price_service import PriceService
 from ..services.currency_service import CurrencyService
 from ..services.snapshot_service import SnapshotService
+from ..utils.ttl_cache import TTLCache
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
-# Lock to prevent multiple concurrent yfinance requests
-_price_fetch_lock = threading.Lock()
-_cached_live_prices = {}  # symbol -> {price, timestamp}
-_cached_change_data = {}  # symbol -> {price, previous_close, change, change_pct, timestamp}
+# In-flight yfinance fetches, keyed by (with_change, "symbol:exchange"), so concurrent
+# requests for the same symbol coalesce without blocking requests for other symbols.
+# Only touched from the event loop, so claiming a key needs no lock.
+_inflight: Dict[Tuple[bool, str], asyncio.Event] = {}
+_inflight_wait_seconds = 30
 _cache_ttl_seconds = 60  # Cache live prices for 60 seconds to prevent duplicate fetches
+_cache_max_entries = 4096  # Bounded so symbols that drop out of the portfolio don't linger forever
+_cached_live_prices = TTLCache(_cache_max_entries, _cache_ttl_seconds)  # symbol:exchange -> {price}
+_cached_change_data = TTLCache(_cache_max_entries, _cache_ttl_seconds)  # symbol:exchange -> {price, previous_close, change, change_pct}
 
+# Account types that are tax-advantaged
+TAX_ADVANTAGED = frozenset({"TFSA", "RRSP", "SDRSP", "FHSA", "RESP", "LIRA", "RRIF", "PPF_INDIA"})
 
-def get_prices_from_cache(db: Session, holdings: list) -> Dict[str, Optional[Decimal]]:
+
+def get_active_holdings(db: Session = Depends(get_db)) -> List[Holding]:
+    """Dependency: active holdings, queried once per request (FastAPI caches dependency results per request)."""
+    # Only the columns the analytics endpoints read; audit/date columns stay deferred
+    return db.query(Holding).options(load_only(
+        Holding.id, Holding.symbol, Holding.company_name, Holding.exchange, Holding.country,
+        Holding.quantity, Holding.avg_purchase_price, Holding.currency, Holding.account_type, Holding.notes
+    )).filter(Holding.is_active == True).all()
+
+
+# Built once with an expanding IN parameter, so the compiled form is reused whatever the number of keys
+_cache_lookup_stmt = select(
+    CurrentPriceCache.symbol, CurrentPriceCache.exchange, CurrentPriceCache.price
+).where(
+    tuple_(CurrentPriceCache.symbol, CurrentPriceCache.exchange).in_(bindparam("keys", expanding=True))
+)
+
+
+def get_prices_from_cache(db: Session, holdings: list) -> Dict[Tuple[str, str], Optional[float]]:
     """
     Get prices from the cache table - instant, no external API calls.
-    Returns dict mapping symbol to price (or None if not cached).
+    Returns dict mapping (symbol, exchange) to price (or None if not cached).
+    Prices are the floats the column reads back; callers only do display math with them.
     """
-    cached = db.query(CurrentPriceCache).filter(
-        CurrentPriceCache.symbol.in_([h.symbol for h in holdings])
-    ).all()
+    keys = [(h.symbol, h.exchange) for h in holdings]
+    cached = db.execute(_cache_lookup_stmt, {"keys": keys})
 
-    cache_lookup = {(c.symbol, c.exchange): Decimal(str(c.price)) for c in cached}
+    cache_lookup = {(symbol, exchange): price for symbol, exchange, price in cached}
+
+    return {key: cache_lookup.get(key) for key in keys}
 
-    result = {}
-    for holding in holdings:
-        result[holding.symbol] = cache_lookup.get((holding.symbol, holding.exchange))
 
-    return result
+def key_prices_by_holding(holdings: list, prices: Dict[str, Optional[Decimal]]) -> Dict[Tuple[str, str], Optional[Decimal]]:
+    """Re-key symbol-keyed live prices by (symbol, exchange) to match get_prices_from_cache."""
+    return {(h.symbol, h.exchange): prices.get(h.symbol) for h in holdings}
 
 
-def save_prices_to_db_cache(db: Session, holdings: list, prices: Dict[str, Decimal]) -> None:
+def save_prices_to_db_cache(db: Session, holdings: list, prices: Dict[Tuple[str, str], Decimal]) -> None:
     """
     Save fetched prices to the CurrentPriceCache table for instant future loads.
     This enables fast=true queries to return data immediately.
     """
     now = datetime.now()
-    saved_count = 0
 
-    for holding in holdings:
-        price = prices.get(holding.symbol)
-        if price is None:
-            continue
-
-        try:
-            existing = db.query(CurrentPriceCache).filter(
-                CurrentPriceCache.symbol == holding.symbol,
-                CurrentPriceCache.exchange == holding.exchange
-            ).first()
-
-            if existing:
-                existing.price = price
-                existing.currency = holding.currency
-                existing.updated_at = now
-            else:
-                cache_entry = CurrentPriceCache(
-                    symbol=holding.symbol,
-                    exchange=holding.exchange,
-                    price=price,
-                    currency=holding.currency
-                )
-                db.add(cache_entry)
-            saved_count += 1
-        except Exception as e:
-            logger.error(f"Error saving price for {holding.symbol}: {e}")
+    # Keyed by (symbol, exchange): a holding in several accounts must appear once,
+    # since ON CONFLICT can't update the same row twice in one statement
+    rows = {
+        (h.symbol, h.exchange): {
+            "symbol": h.symbol,
+            "exchange": h.exchange,
+            "price": price,
+            "currency": h.currency,
+            "updated_at": now,
+        }
+        for h in holdings
+        if (price := prices.get((h.symbol, h.exchange))) is not None
+    }
+    if not rows:
+        return
+
+    # Single INSERT ... ON CONFLICT DO UPDATE instead of SELECT + INSERT/UPDATE per holding
+    stmt = sqlite_upsert(CurrentPriceCache.__table__).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["symbol", "exchange"],
+        set_={
+            "price": stmt.excluded.price,
+            "currency": stmt.excluded.currency,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
 
     try:
+        db.execute(stmt)
         db.commit()
-        if saved_count > 0:
-            logger.info(f"Saved {saved_count} prices to DB cache")
+        logger.info(f"Saved {len(rows)} prices to DB cache")
     except Exception as e:
         logger.error(f"Failed to commit price cache: {e}")
         db.rollback()
 
 
-def get_prices_with_dedup(symbols: list, with_change: bool = False) -> Dict:
+async def get_prices_with_dedup(symbols: list, with_change: bool = False) -> Dict:
     """
     Fetch prices with request deduplication.
-    Multiple concurrent requests will share the same yfinance call.
+    Concurrent requests for the same symbol share one yfinance call;
+    requests for different symbols fetch in parallel. The blocking yfinance
+    call runs in a worker thread so the event loop stays free meanwhile.
     """
-    global _cached_live_prices, _cached_change_data
-
-    now = datetime.now()
     cache = _cached_change_data if with_change else _cached_live_prices
 
     # Check if we have fresh cached data for all symbols
     results = {}
     symbols_to_fetch = []
 
+    # Build each "symbol:exchange" cache key once and carry it through every pass
     for symbol, exchange in symbols:
         cache_key = f"{symbol}:{exchange}"
-        if cache_key in cache:
-            cached = cache[cache_key]
-            age = (now - cached['timestamp']).total_seconds()
-            if age < _cache_ttl_seconds:
-                if with_change:
-                    results[symbol] = {
-                        'price': cached['price'],
-                        'previous_close': cached.get('previous_close'),
-                        'change': cached.get('change'),
-                        'change_pct': cached.get('change_pct')
-                    }
-                else:
-                    results[symbol] = cached['price']
-                continue
-        symbols_to_fetch.append((symbol, exchange))
+        cached = cache.get(cache_key)
+        if cached is not None:
+            results[symbol] = dict(cached) if with_change else cached['price']
+            continue
+        symbols_to_fetch.append((symbol, exchange, cache_key))
 
     if not symbols_to_fetch:
         logger.info("All prices served from in-memory dedup cache")
         return results
 
-    # Acquire lock to prevent duplicate fetches
-    with _price_fetch_lock:
-        # Double-check cache after acquiring lock (another thread may have fetched)
-        final_to_fetch = []
-        for symbol, exchange in symbols_to_fetch:
-            cache_key = f"{symbol}:{exchange}"
-            if cache_key in cache:
-                cached = cache[cache_key]
-                age = (now - cached['timestamp']).total_seconds()
-                if age < _cache_ttl_seconds:
-                    if with_change:
-                        results[symbol] = {
-                            'price': cached['price'],
-                            'previous_close': cached.get('previous_close'),
-                            'change': cached.get('change'),
-                            'change_pct': cached.get('change_pct')
-                        }
-                    else:
-                        results[symbol] = cached['price']
-                    continue
+    # Claim the symbols nobody else is fetching; wait on the ones already in flight
+    final_to_fetch = []
+    claimed = []
+    waiting = []
+    cache_keys = {}  # symbol -> cache key, for storing what we fetch
+    for symbol, exchange, cache_key in symbols_to_fetch:
+        inflight_key = (with_change, cache_key)
+        event = _inflight.get(inflight_key)
+        if event is not None:
+            waiting.append((symbol, cache_key, event))
+        else:
+            _inflight[inflight_key] = asyncio.Event()
+            claimed.append(inflight_key)
             final_to_fetch.append((symbol, exchange))
+            cache_keys[symbol] = cache_key
 
-        if not final_to_fetch:
-            return results
-
+    try:
         # Filter out MF (mutual fund) symbols - they don't exist on yfinance
         # Also filter out NSE Indian stocks with custom symbols
         yf_symbols = [(s, e) for s, e in final_to_fetch if e not in ("MF",)]
@@ -157,35 +171,38 @@ def get_prices_with_dedup(symbols: list, with_change: bool = False) -> Dict:
             logger.info(f"Skipped {skipped} symbols not on yfinance (MF/custom)")
         final_to_fetch = yf_symbols
 
-        if not final_to_fetch:
-            return results
-
-        # Actually fetch from yfinance
-        logger.info(f"Fetching {len(final_to_fetch)} symbols from yfinance (with_change={with_change})")
-
-        if with_change:
-            fetched = PriceService.get_prices_with_change_bulk(final_to_fetch)
-            for symbol, data in fetched.items():
-                exchange = next((e for s, e in final_to_fetch if s == symbol), '')
-                cache_key = f"{symbol}:{exchange}"
-                _cached_change_data[cache_key] = {
-                    'price': data.get('price'),
-                    'previous_close': data.get('previous_close'),
-                    'change': data.get('change'),
-                    'change_pct': data.get('change_pct'),
-                    'timestamp': now
-                }
-                results[symbol] = data
-        else:
-            fetched = PriceService.get_prices_bulk(final_to_fetch)
-            for symbol, price in fetched.items():
-                exchange = next((e for s, e in final_to_fetch if s == symbol), '')
-                cache_key = f"{symbol}:{exchange}"
-                _cached_live_prices[cache_key] = {
-                    'price': price,
-                    'timestamp': now
-                }
-                results[symbol] = price
+        if final_to_fetch:
+            # Actually fetch from yfinance
+            logger.info(f"Fetching {len(final_to_fetch)} symbols from yfinance (with_change={with_change})")
+
+            if with_change:
+                fetched = await asyncio.to_thread(PriceService.get_prices_with_change_bulk, final_to_fetch)
+                for symbol, data in fetched.items():
+                    _cached_change_data[cache_keys.get(symbol, f"{symbol}:")] = {
+                        'price': data.get('price'),
+                        'previous_close': data.get('previous_close'),
+                        'change': data.get('change'),
+                        'change_pct': data.get('change_pct')
+                    }
+                    results[symbol] = data
+            else:
+                fetched = await asyncio.to_thread(PriceService.get_prices_bulk, final_to_fetch)
+                for symbol, price in fetched.items():
+                    _cached_live_prices[cache_keys.get(symbol, f"{symbol}:")] = {'price': price}
+                    results[symbol] = price
+    finally:
+        # Release waiters even if the fetch failed; they'll find nothing cached and move on
+        for inflight_key in claimed:
+            _inflight.pop(inflight_key).set()
+
+    for symbol, cache_key, event in waiting:
+        try:
+            await asyncio.wait_for(event.wait(), timeout=_inflight_wait_seconds)
+        except asyncio.TimeoutError:
+            pass
+        cached = cache.get(cache_key)
+        if cached is not None:
+            results[symbol] = dict(cached) if with_change else cached['price']
 
     return results
 
@@ -200,19 +217,117 @@ async def calculate_portfolio_summary(db: Session, fast: bool = False, region: s
         fast: If True, use cached prices for instant response (no daily change data)
         region: Filter by region: 'all', 'CA' (Canada), or 'IN' (India)
     """
-    query = db.query(Holding).filter(Holding.is_active == True)
+    filters = [Holding.is_active == True]
     
     # Filter by region
     # CA = North America (CA + US holdings in Canadian accounts)
     # IN = India (DEMAT + MF_INDIA)
     if region == 'CA':
-        query = query.filter(Holding.country.in_(['CA', 'US']))
+        filters.append(Holding.country.in_(['CA', 'US']))
     elif region == 'IN':
-        query = query.filter(Holding.country == 'IN')
+        filters.append(Holding.country == 'IN')
     # 'all' = no additional filter
+
+    if fast:
+        return await summarize_from_cache(db, filters)
     
-    holdings = query.all()
+    holdings = db.query(Holding).filter(*filters).all()
+
+    summary, _ = await summarize_holdings(db, holdings, fast)
+    return summary
+
 
+async def summarize_from_cache(db: Session, filters: list) -> Dict:
+    """
+    fast=true summary computed in SQL: value and cost of every holding with a
+    cached price are summed in one aggregate query (FX applied with a CASE on
+    currency); only holdings without a cached price are loaded and valued in Python.
+    """
+    currencies = {c for (c,) in db.query(Holding.currency).filter(*filters).distinct()}
+    fx = await CurrencyService.get_exchange_rates_bulk_async(currencies - {"CAD"}, "CAD", db)
+    # Holdings whose currency has no rate stay unconverted, same as the row-by-row path
+    fx_floats = {c: float(r) for c, r in fx.items() if c != "CAD"}
+    rate = case(fx_floats, value=Holding.currency, else_=1.0) if fx_floats else literal(1.0)
+    has_cached_price = and_(
+        CurrentPriceCache.symbol == Holding.symbol,
+        CurrentPriceCache.exchange == Holding.exchange
+    )
+
+    priced_count, total_value_cad, total_cost_cad = db.query(
+        func.count(Holding.id),
+        func.coalesce(func.sum(Holding.quantity * CurrentPriceCache.price * rate, type_=Float), 0.0),
+        func.coalesce(func.sum(Holding.quantity * Holding.avg_purchase_price * rate, type_=Float), 0.0),
+    ).join(CurrentPriceCache, has_cached_price).filter(*filters).one()
+
+    # Holdings with no cached price (mutual funds, FDs, PPF...) use the snapshot in
+    # their notes, or cost basis, exactly as the row-by-row path does
+    unpriced = db.query(Holding).outerjoin(CurrentPriceCache, has_cached_price).filter(
+        *filters, CurrentPriceCache.id.is_(None)
+    ).all()
+    for holding in unpriced:
+        total_cost = float(holding.quantity) * float(holding.avg_purchase_price)
+        market_value = snapshot_value_from_notes(holding)
+        if market_value is None:
+            logger.info(f"Using cost basis for {holding.symbol} (no live price)")
+            market_value = total_cost
+        rate_value = fx_floats.get(holding.currency, 1.0)
+        total_value_cad += market_value * rate_value
+        total_cost_cad += total_cost * rate_value
+
+    countries = dict(
+        db.query(Holding.country, func.count(Holding.id)).filter(*filters).group_by(Holding.country).all()
+    )
+
+    unrealized_gain_cad = total_value_cad - total_cost_cad
+    unrealized_gain_pct = (unrealized_gain_cad / total_cost_cad * 100) if total_cost_cad > 0 else 0.0
+
+    # No previous-close data in fast mode, so no daily change
+    return {
+        "total_value_cad": total_value_cad,
+        "total_cost_cad": total_cost_cad,
+        "unrealized_gain_cad": unrealized_gain_cad,
+        "unrealized_gain_pct": unrealized_gain_pct,
+        "today_change_cad": 0.0,
+        "today_change_pct": 0.0,
+        "holdings_count": priced_count + len(unpriced),
+        "countries": countries,
+        "source": "cache",
+        "last_updated": datetime.now()
+    }
+
+
+def fx_multiplier(currency: str, fx: Dict[str, Decimal]) -> float:
+    """CAD conversion factor for a currency; amounts with no known rate stay unconverted (1.0)."""
+    return 1.0 if currency == "CAD" else float(fx.get(currency) or 1.0)
+
+
+def snapshot_value_from_notes(holding) -> Optional[float]:
+    """Parse the 'Snapshot: ₹X,XXX' value imports leave in notes for unpriced holdings."""
+    import re
+    if holding.notes and "Snapshot:" in holding.notes:
+        match = re.search(r'Snapshot: ₹([\d,]+)', holding.notes)
+        if match:
+            try:
+                return float(match.group(1).replace(',', ''))
+            except ValueError:
+                pass
+    return None
+
+
+async def summarize_holdings(
+    db: Session,
+    holdings: list,
+    fast: bool = False,
+    price_data: Optional[Dict] = None,
+    fx: Optional[Dict[str, Decimal]] = None
+) -> Tuple[Dict, Optional[Dict]]:
+    """
+    Summarize an already-loaded list of holdings.
+
+    Returns (summary, price_data) so callers that also need per-symbol daily
+    change (e.g. the briefing) can reuse the same fetch. price_data is None in fast mode.
+    Callers that already fetched live price_data and/or FX rates can pass them in.
+    """
     if not holdings:
         return {
             "total_value_cad": 0,
@@ -225,7 +340,7 @@ async def calculate_portfolio_summary(db: Session, fast: bool = False, region: s
             "countries": {},
             "last_updated": datetime.now(),
             "source": "cache" if fast else "live"
-        }
+        }, None
 
     symbols = [(h.symbol, h.exchange) for h in holdings]
 
@@ -236,73 +351,66 @@ async def calculate_portfolio_summary(db: Session, fast: bool = False, region: s
         logger.info(f"Using cached prices for {len(holdings)} holdings")
     else:
         # Use dedup helper to prevent multiple concurrent yfinance calls
-        price_data = get_prices_with_dedup(symbols, with_change=True)
-        current_prices = {sym: data['price'] for sym, data in price_data.items()}
+        if price_data is None:
+            price_data = await get_prices_with_dedup(symbols, with_change=True)
+        current_prices = key_prices_by_holding(
+            holdings, {sym: data['price'] for sym, data in price_data.items()}
+        )
 
         # Save fetched prices to DB cache for future fast=true requests
         save_prices_to_db_cache(db, holdings, current_prices)
 
-    # Calculate totals in CAD
-    total_value_cad = Decimal("0")
-    total_cost_cad = Decimal("0")
-    total_previous_value_cad = Decimal("0")  # For accurate daily change
-    countries = defaultdict(int)
+    # One rate lookup per currency rather than per holding
+    if fx is None:
+        fx = await CurrencyService.get_exchange_rates_bulk_async({h.currency for h in holdings} - {"CAD"}, "CAD", db)
 
-    for holding in holdings:
-        countries[holding.country] += 1
-
-        # Get current price
-        current_price = current_prices.get(holding.symbol)
-        
-        # For holdings without live prices (e.g., mutual funds), try snapshot value from notes
-        if current_price is None:
-            import re
-            snapshot_value = None
-            if holding.notes and "Snapshot:" in holding.notes:
-                match = re.search(r'Snapshot: ₹([\d,]+)', holding.notes)
-                if match:
-                    try:
-                        snapshot_value = Decimal(match.group(1).replace(',', ''))
-                    except:
-                        pass
-            
-            if snapshot_value is None:
-                # Fall back to cost basis for holdings without live prices (FDs, PPF, etc.)
-                logger.info(f"Using cost basis for {holding.symbol} (no live price)")
-                market_value = holding.quantity * holding.avg_purchase_price
-            else:
-                # Use snapshot value directly as market value
-                market_value = snapshot_value
-            total_cost = holding.quantity * holding.avg_purchase_price
-        else:
-            # Calculate market value in holding's currency
-            market_value = holding.quantity * current_price
-            total_cost = holding.quantity * holding.avg_purchase_price
-        
-        # Calculate previous value for daily change (if we have the data)
-        # For holdings without previous close (FDs, PPF, etc.), use current value
-        # so they contribute 0 to daily change
-        previous_value = market_value  # Default to current value (0 change)
-        if price_data and holding.symbol in price_data:
-            prev_close = price_data[holding.symbol].get('previous_close')
-            if prev_close:
-                previous_value = holding.quantity * prev_close
-
-        # Convert to CAD
-        if holding.currency != "CAD":
-            rate = CurrencyService.get_exchange_rate_sync(holding.currency, "CAD", db)
-            if rate:
-                market_value = market_value * rate
-                total_cost = total_cost * rate
-                previous_value = previous_value * rate
-
-        total_value_cad += market_value
-        total_cost_cad += total_cost
-        total_previous_value_cad += previous_value
+    # Calculate totals in CAD
+    # Float arrays, one slot per holding: these are display totals, so the per-holding
+    # values and the CAD conversion are computed as whole-array operations
+    n = len(holdings)
+    quantity = np.fromiter((float(h.quantity) for h in holdings), dtype=float, count=n)
+    total_cost = quantity * np.fromiter((float(h.avg_purchase_price) for h in holdings), dtype=float, count=n)
+    rate = np.fromiter((fx_multiplier(h.currency, fx) for h in holdings), dtype=float, count=n)
+    current_price = np.fromiter(
+        (
+            np.nan if (price := current_prices.get((h.symbol, h.exchange))) is None else float(price)
+            for h in holdings
+        ),
+        dtype=float,
+        count=n
+    )
+
+    # Market value in holding's currency
+    market_value = quantity * current_price
+    # Holdings without live prices (e.g., mutual funds) use the snapshot value from notes,
+    # then cost basis (FDs, PPF, etc.)
+    for i in np.flatnonzero(np.isnan(current_price)):
+        snapshot_value = snapshot_value_from_notes(holdings[i])
+        if snapshot_value is None:
+            logger.info(f"Using cost basis for {holdings[i].symbol} (no live price)")
+            snapshot_value = total_cost[i]
+        market_value[i] = snapshot_value
+
+    # Previous value for daily change (if we have the data). Holdings without a previous
+    # close (FDs, PPF, etc.) use their current value, so they contribute 0 to daily change
+    previous_value = market_value
+    if price_data:
+        previous_close = np.fromiter(
+            (float((price_data.get(h.symbol) or {}).get('previous_close') or np.nan) for h in holdings),
+            dtype=float,
+            count=n
+        )
+        previous_value = np.where(np.isnan(previous_close), market_value, quantity * previous_close)
+
+    # Convert to CAD and total
+    total_value_cad = float(market_value @ rate)
+    total_cost_cad = float(total_cost @ rate)
+    total_previous_value_cad = float(previous_value @ rate)
+    countries = Counter(h.country for h in holdings)
 
     # Calculate gains
     unrealized_gain_cad = total_value_cad - total_cost_cad
-    unrealized_gain_pct = (unrealized_gain_cad / total_cost_cad * 100) if total_cost_cad > 0 else Decimal("0")
+    unrealized_gain_pct = (unrealized_gain_cad / total_cost_cad * 100) if total_cost_cad > 0 else 0.0
 
     # Calculate today's change - only use accurate method with live price data
     # Don't use snapshot-based change as it's misleading when holdings are added/removed
@@ -314,21 +422,21 @@ async def calculate_portfolio_summary(db: Session, fast: bool = False, region: s
     else:
         # In fast mode without live prices, we can't reliably calculate daily change
         # (snapshot-based change is misleading when holdings are added/removed)
-        today_change_cad = Decimal("0")
-        today_change_pct = Decimal("0")
+        today_change_cad = 0.0
+        today_change_pct = 0.0
 
     return {
-        "total_value_cad": float(total_value_cad),
-        "total_cost_cad": float(total_cost_cad),
-        "unrealized_gain_cad": float(unrealized_gain_cad),
-        "unrealized_gain_pct": float(unrealized_gain_pct),
-        "today_change_cad": float(today_change_cad),
-        "today_change_pct": float(today_change_pct),
+        "total_value_cad": total_value_cad,
+        "total_cost_cad": total_cost_cad,
+        "unrealized_gain_cad": unrealized_gain_cad,
+        "unrealized_gain_pct": unrealized_gain_pct,
+        "today_change_cad": today_change_cad,
+        "today_change_pct": today_change_pct,
         "holdings_count": len(holdings),
         "countries": dict(countries),
         "source": "cache" if fast else "live",
         "last_updated": datetime.now()
-    }
+    }, price_data
 
 
 @router.get("/portfolio/summary")
@@ -348,7 +456,7 @@ async def get_portfolio_summary(
 
 
 @router.get("/allocation")
-async def get_allocation(
+def get_allocation(
     db: Session = Depends(get_db),
     fast: bool = Query(False, description="Use cached prices for instant response"),
     region: str = Query('all', description="Filter by region: 'all', 'CA' (Canada), or 'IN' (India)")
@@ -379,50 +487,42 @@ async def get_allocation(
         current_prices = get_prices_from_cache(db, holdings)
     else:
         symbols = [(h.symbol, h.exchange) for h in holdings]
-        # Use dedup helper to prevent multiple concurrent yfinance calls
-        current_prices = get_prices_with_dedup(symbols, with_change=False)
+        # Use dedup helper to prevent multiple concurrent yfinance calls; it runs on the
+        # event loop, and this threadpool worker waits for it
+        current_prices = key_prices_by_holding(holdings, from_thread.run(get_prices_with_dedup, symbols, False))
 
         # Save fetched prices to DB cache for future fast=true requests
         save_prices_to_db_cache(db, holdings, current_prices)
 
-    # Calculate allocations
-    by_country = defaultdict(lambda: Decimal("0"))
-    by_exchange = defaultdict(lambda: Decimal("0"))
+    fx = load_cad_rates({h.currency for h in holdings} - {"CAD"})
+
+    # Calculate allocations (float math; every value is reported as a float anyway)
+    by_country = defaultdict(float)
+    by_exchange = defaultdict(float)
     holdings_with_value = []
 
-    total_portfolio_value = Decimal("0")
+    total_portfolio_value = 0.0
 
     for holding in holdings:
-        current_price = current_prices.get(holding.symbol)
+        current_price = current_prices.get((holding.symbol, holding.exchange))
+        quantity = float(holding.quantity)
         
         # For holdings without live prices (e.g., mutual funds), try snapshot value from notes
         if current_price is None:
-            import re
-            snapshot_value = None
-            if holding.notes and "Snapshot:" in holding.notes:
-                match = re.search(r'Snapshot: ₹([\d,]+)', holding.notes)
-                if match:
-                    try:
-                        snapshot_value = Decimal(match.group(1).replace(',', ''))
-                    except:
-                        pass
-            
+            snapshot_value = snapshot_value_from_notes(holding)
             if snapshot_value is None:
                 continue
             
             # Use snapshot value directly as market value (already in holding currency)
             market_value = snapshot_value
-            display_price = float(snapshot_value / holding.quantity) if holding.quantity > 0 else 0
+            display_price = snapshot_value / quantity if quantity > 0 else 0
         else:
             # Calculate market value in CAD
-            market_value = holding.quantity * current_price
             display_price = float(current_price)
+            market_value = quantity * display_price
 
         # Convert to CAD
-        if holding.currency != "CAD":
-            rate = CurrencyService.get_exchange_rate_sync(holding.currency, "CAD", db)
-            if rate:
-                market_value = market_value * rate
+        market_value *= fx_multiplier(holding.currency, fx)
 
         total_portfolio_value += market_value
 
@@ -432,49 +532,48 @@ async def get_allocation(
         holdings_with_value.append({
             "symbol": holding.symbol,
             "company_name": holding.company_name,
-            "market_value": float(market_value),
-            "quantity": float(holding.quantity),
+            "market_value": market_value,
+            "quantity": quantity,
             "current_price": display_price,
             "currency": holding.currency
         })
 
     # Convert to percentages
     by_country_pct = {
-        country: float(value / total_portfolio_value * 100) if total_portfolio_value > 0 else 0
+        country: value / total_portfolio_value * 100 if total_portfolio_value > 0 else 0
         for country, value in by_country.items()
     }
 
     by_exchange_pct = {
-        exchange: float(value / total_portfolio_value * 100) if total_portfolio_value > 0 else 0
+        exchange: value / total_portfolio_value * 100 if total_portfolio_value > 0 else 0
         for exchange, value in by_exchange.items()
     }
 
-    # Sort and get top 10 holdings
-    holdings_with_value.sort(key=lambda x: x['market_value'], reverse=True)
-    top_holdings = holdings_with_value[:10]
+    # Top 10 holdings by value (partial sort; the rest are never shown)
+    top_holdings = heapq.nlargest(10, holdings_with_value, key=lambda x: x['market_value'])
 
     # Add percentage to top holdings
     for holding in top_holdings:
-        holding['percentage'] = float(
-            Decimal(str(holding['market_value'])) / total_portfolio_value * 100
+        holding['percentage'] = (
+            holding['market_value'] / total_portfolio_value * 100
         ) if total_portfolio_value > 0 else 0
 
     return {
         "by_country": by_country_pct,
         "by_exchange": by_exchange_pct,
         "top_holdings": top_holdings,
-        "total_value_cad": float(total_portfolio_value),
+        "total_value_cad": total_portfolio_value,
         "source": "cache" if fast else "live"
     }
 
 
 @router.get("/performance")
-async def get_performance(
+def get_performance(
     db: Session = Depends(get_db),
+    holdings: List[Holding] = Depends(get_active_holdings),
     fast: bool = Query(False, description="Use cached prices for instant response")
 ) -> Dict:
     """Get performance metrics for the portfolio"""
-    holdings = db.query(Holding).filter(Holding.is_active == True).all()
 
     if not holdings:
         return {
@@ -489,8 +588,9 @@ async def get_performance(
         current_prices = get_prices_from_cache(db, holdings)
     else:
         symbols = [(h.symbol, h.exchange) for h in holdings]
-        # Use dedup helper to prevent multiple concurrent yfinance calls
-        current_prices = get_prices_with_dedup(symbols, with_change=False)
+        # Use dedup helper to prevent multiple concurrent yfinance calls; it runs on the
+        # event loop, and this threadpool worker waits for it
+        current_prices = key_prices_by_holding(holdings, from_thread.run(get_prices_with_dedup, symbols, False))
 
         # Save fetched prices to DB cache for future fast=true requests
         save_prices_to_db_cache(db, holdings, current_prices)
@@ -499,28 +599,29 @@ async def get_performance(
     holdings_performance = []
 
     for holding in holdings:
-        current_price = current_prices.get(holding.symbol)
+        current_price = current_prices.get((holding.symbol, holding.exchange))
         if current_price is None:
             continue
 
-        gain = current_price - holding.avg_purchase_price
-        gain_pct = (gain / holding.avg_purchase_price * 100) if holding.avg_purchase_price > 0 else Decimal("0")
+        # Float math: cached prices are floats, live ones Decimal, and every value is reported as a float
+        current_price = float(current_price)
+        avg_cost = float(holding.avg_purchase_price)
+        gain = current_price - avg_cost
+        gain_pct = (gain / avg_cost * 100) if avg_cost > 0 else 0.0
 
         holdings_performance.append({
             "symbol": holding.symbol,
             "company_name": holding.company_name,
-            "current_price": float(current_price),
-            "avg_cost": float(holding.avg_purchase_price),
-            "gain": float(gain),
-            "gain_pct": float(gain_pct),
+            "current_price": current_price,
+            "avg_cost": avg_cost,
+            "gain": gain,
+            "gain_pct": gain_pct,
             "currency": holding.currency
         })
 
-    # Sort by performance
-    holdings_performance.sort(key=lambda x: x['gain_pct'], reverse=True)
-
-    best_performers = holdings_performance[:5]
-    worst_performers = holdings_performance[-5:][::-1]  # Reverse to show worst first
+    # Only the ends of the ranking are returned, so partial-sort each end
+    best_performers = heapq.nlargest(5, holdings_performance, key=lambda x: x['gain_pct'])
+    worst_performers = heapq.nsmallest(5, holdings_performance, key=lambda x: x['gain_pct'])  # Worst first
 
     return {
         "best_performers": best_performers,
@@ -531,7 +632,7 @@ async def get_performance(
 
 
 @router.get("/portfolio-value")
-async def get_portfolio_value_history(days: int = 30, db: Session = Depends(get_db)) -> Dict:
+def get_portfolio_value_history(days: int = 30, db: Session = Depends(get_db)) -> Dict:
     """Get portfolio value over time"""
     # This is a simplified version
     # In a real implementation, you'd calculate historical portfolio value
@@ -544,8 +645,9 @@ async def get_portfolio_value_history(days: int = 30, db: Session = Depends(get_
 
 
 @router.get("/daily-movers")
-async def get_daily_movers(
+def get_daily_movers(
     db: Session = Depends(get_db),
+    holdings: List[Holding] = Depends(get_active_holdings),
     limit: int = Query(5, description="Number of top movers to return per direction")
 ) -> Dict:
     """
@@ -554,8 +656,6 @@ async def get_daily_movers(
     Returns all holdings sorted by daily change, plus top gainers/losers lists.
     Uses live price data with previous close for accurate daily change calculation.
     """
-    holdings = db.query(Holding).filter(Holding.is_active == True).all()
-    
     if not holdings:
         return {
             "all_holdings": [],
@@ -569,7 +669,20 @@ async def get_daily_movers(
     
     # Get prices with daily change data
     price_data = PriceService.get_prices_with_change_bulk(symbols)
-    
+
+    return build_daily_movers(db, holdings, price_data, limit)
+
+
+def build_daily_movers(
+    db: Session,
+    holdings: list,
+    price_data: Dict,
+    limit: int,
+    fx: Optional[Dict[str, Decimal]] = None
+) -> Dict:
+    """Rank holdings by daily change using already-fetched price-with-change data."""
+    if fx is None:
+        fx = CurrencyService.get_exchange_rates_bulk({h.currency for h in holdings} - {"CAD"}, "CAD", db)
     holdings_with_change = []
     
     for holding in holdings:
@@ -577,95 +690,104 @@ async def get_daily_movers(
         if not data or data.get('price') is None:
             continue
         
-        current_price = data['price']
+        # Float math throughout; the response is all floats anyway
+        quantity = float(holding.quantity)
+        current_price = float(data['price'])
         previous_close = data.get('previous_close')
-        change = data.get('change', Decimal('0'))
-        change_pct = data.get('change_pct', Decimal('0'))
+        change = float(data.get('change') or 0)
+        change_pct = float(data.get('change_pct') or 0)
         
         # Calculate market value and change in CAD
-        market_value = holding.quantity * current_price
-        day_change_value = holding.quantity * change if change else Decimal('0')
+        market_value = quantity * current_price
+        day_change_value = quantity * change
         
+        cost_basis = quantity * float(holding.avg_purchase_price)
+
         # Convert to CAD
-        if holding.currency != "CAD":
-            rate = CurrencyService.get_exchange_rate_sync(holding.currency, "CAD", db)
-            if rate:
-                market_value = market_value * rate
-                day_change_value = day_change_value * rate
+        rate = fx_multiplier(holding.currency, fx)
+        market_value *= rate
+        day_change_value *= rate
+        cost_basis *= rate
         
         # Calculate unrealized gain
-        cost_basis = holding.quantity * holding.avg_purchase_price
-        if holding.currency != "CAD":
-            rate = CurrencyService.get_exchange_rate_sync(holding.currency, "CAD", db)
-            if rate:
-                cost_basis = cost_basis * rate
-        
         unrealized_gain = market_value - cost_basis
-        unrealized_gain_pct = (unrealized_gain / cost_basis * 100) if cost_basis > 0 else Decimal('0')
+        unrealized_gain_pct = (unrealized_gain / cost_basis * 100) if cost_basis > 0 else 0.0
         
         holdings_with_change.append({
             "symbol": holding.symbol,
             "company_name": holding.company_name,
             "exchange": holding.exchange,
             "currency": holding.currency,
-            "quantity": float(holding.quantity),
-            "current_price": float(current_price),
+            "quantity": quantity,
+            "current_price": current_price,
             "previous_close": float(previous_close) if previous_close else None,
-            "day_change": float(change) if change else 0,
-            "day_change_pct": float(change_pct) if change_pct else 0,
-            "day_change_cad": float(day_change_value),
-            "market_value_cad": float(market_value),
-            "unrealized_gain_cad": float(unrealized_gain),
-            "unrealized_gain_pct": float(unrealized_gain_pct)
+            "day_change": change,
+            "day_change_pct": change_pct,
+            "day_change_cad": day_change_value,
+            "market_value_cad": market_value,
+            "unrealized_gain_cad": unrealized_gain,
+            "unrealized_gain_pct": unrealized_gain_pct
         })
     
     # Sort by day change percentage
     holdings_with_change.sort(key=lambda x: x['day_change_pct'], reverse=True)
     
-    # Get top gainers and losers
-    gainers = [h for h in holdings_with_change if h['day_change_pct'] > 0]
-    losers = [h for h in holdings_with_change if h['day_change_pct'] < 0]
-    losers.reverse()  # Most negative first
+    # Gainers are a prefix and losers a suffix of the sorted list, so only the ends need scanning
+    top_gainers = [h for h in holdings_with_change[:limit] if h['day_change_pct'] > 0]
+    top_losers = [h for h in reversed(holdings_with_change[max(len(holdings_with_change) - limit, 0):]) if h['day_change_pct'] < 0]  # Most negative first
     
     return {
         "all_holdings": holdings_with_change,
-        "top_gainers": gainers[:limit],
-        "top_losers": losers[:limit],
+        "top_gainers": top_gainers,
+        "top_losers": top_losers,
         "holdings_count": len(holdings_with_change),
         "last_updated": datetime.now()
     }
 
 
+def load_cad_rates(currencies: set) -> Dict[str, Decimal]:
+    """FX lookup for sync handlers and worker threads, on its own session (sessions aren't thread-safe)."""
+    with SessionLocal() as fx_db:
+        rates = CurrencyService.get_exchange_rates_bulk(currencies, "CAD", fx_db)
+        fx_db.commit()  # keep any rates fetched from the API
+        return rates
+
+
 @router.get("/briefing")
-async def get_portfolio_briefing(db: Session = Depends(get_db)) -> Dict:
+async def get_portfolio_briefing(
+    db: Session = Depends(get_db),
+    holdings: List[Holding] = Depends(get_active_holdings)
+) -> Dict:
     """
     Get a complete portfolio briefing suitable for daily summary.
     
     Combines portfolio summary, daily movers, and allocation data
     into a single response optimized for generating a text briefing.
     """
-    # Get all the data we need
-    summary = await calculate_portfolio_summary(db, fast=False)
-    movers = await get_daily_movers(db, limit=4)
-    
-    # Get allocation for concentration analysis
-    holdings = db.query(Holding).filter(Holding.is_active == True).all()
+    # One holdings query, one price fetch and one FX lookup feed both the summary and the movers
     symbols = [(h.symbol, h.exchange) for h in holdings]
-    current_prices = PriceService.get_prices_bulk(symbols)
+
+    # The yfinance fetch and the FX lookup are independent, so run them side by side
+    price_data, fx = await asyncio.gather(
+        get_prices_with_dedup(symbols, with_change=True),
+        asyncio.to_thread(load_cad_rates, {h.currency for h in holdings} - {"CAD"})
+    )
+    summary, _ = await summarize_holdings(db, holdings, fast=False, price_data=price_data, fx=fx)
+    movers = build_daily_movers(db, holdings, price_data, limit=4, fx=fx)
     
-    total_value = Decimal(str(summary['total_value_cad']))
+    total_value = summary['total_value_cad']
     
     # Build concentration alerts
     alerts = []
     for holding_data in movers['all_holdings']:
-        pct = Decimal(str(holding_data['market_value_cad'])) / total_value * 100 if total_value > 0 else Decimal('0')
+        pct = holding_data['market_value_cad'] / total_value * 100.0 if total_value > 0 else 0.0
         
         # Alert if single position > 15%
         if pct > 15:
             alerts.append({
                 "type": "concentration",
                 "symbol": holding_data['symbol'],
-                "message": f"{holding_data['symbol']} is {float(pct):.1f}% of portfolio",
+                "message": f"{holding_data['symbol']} is {pct:.1f}% of portfolio",
                 "severity": "warning"
             })
         
@@ -698,8 +820,13 @@ async def get_portfolio_briefing(db: Session = Depends(get_db)) -> Dict:
     }
 
 
+def round_trip_key(quantity, price) -> Tuple[int, int]:
+    """Integer (quantity to 4dp, price to 2dp) key for matching same-day sell/buy pairs."""
+    return round(float(quantity) * 10000), round(float(price) * 100)
+
+
 @router.get("/realized-gains")
-async def get_realized_gains(db: Session = Depends(get_db)) -> Dict:
+def get_realized_gains(db: Session = Depends(get_db)) -> Dict:
     """
     Calculate realized gains/losses from completed (SELL) transactions.
 
@@ -710,8 +837,10 @@ async def get_realized_gains(db: Session = Depends(get_db)) -> Dict:
     Same-day sell/buy transactions at identical price and quantity are detected
     as account transfers and excluded from realized gains calculations.
     """
-    # Get all holdings (including inactive ones for historical sells)
-    holdings = db.query(Holding).all()
+    # Get all holdings (including inactive ones for historical sells); only the columns used below
+    holdings = db.query(Holding).options(load_only(
+        Holding.id, Holding.symbol, Holding.company_name, Holding.exchange, Holding.currency
+    )).all()
 
     if not holdings:
         return {
@@ -724,30 +853,40 @@ async def get_realized_gains(db: Session = Depends(get_db)) -> Dict:
             "method": "FIFO"
         }
 
+    # Load every transaction in one query (ordered by date, id) and group per holding
+    txns_by_holding = defaultdict(list)
+    for txn in db.query(Transaction).filter(
+        Transaction.holding_id.in_([h.id for h in holdings])
+    ).order_by(Transaction.holding_id, Transaction.transaction_date.asc(), Transaction.id.asc()):
+        txns_by_holding[txn.holding_id].append(txn)
+
     # First, identify true round-trips (account transfers) to exclude
     # These are same-day sell/buy pairs with identical quantity and price
     round_trips = set()
     for holding in holdings:
-        transactions = db.query(Transaction).filter(
-            Transaction.holding_id == holding.id
-        ).order_by(Transaction.transaction_date.asc(), Transaction.id.asc()).all()
+        transactions = txns_by_holding.get(holding.id, [])
 
         # Group by date
         by_date = defaultdict(list)
         for txn in transactions:
             by_date[txn.transaction_date].append(txn)
 
-        # Find matching sell/buy pairs on same day
+        # Find matching sell/buy pairs on same day by hashing each buy's
+        # (quantity, price) rounded to 4 and 2 decimals, then probing per sell
         for date, day_txns in by_date.items():
-            sells = [t for t in day_txns if t.transaction_type == "SELL"]
-            buys = [t for t in day_txns if t.transaction_type == "BUY"]
+            buy_keys = {
+                round_trip_key(t.quantity, t.price_per_share)
+                for t in day_txns if t.transaction_type == "BUY"
+            }
+            if not buy_keys:
+                continue
+            for sell in day_txns:
+                if sell.transaction_type == "SELL":
+                    key = round_trip_key(sell.quantity, sell.price_per_share)
+                    if key in buy_keys:
+                        round_trips.add((holding.symbol, date) + key)
 
-            for sell in sells:
-                for buy in buys:
-                    # Check if same quantity and price (within small tolerance)
-                    if (abs(float(sell.quantity) - float(buy.quantity)) < 0.0001 and
-                        abs(float(sell.price_per_share) - float(buy.price_per_share)) < 0.01):
-                        round_trips.add((holding.symbol, date, float(sell.quantity), float(sell.price_per_share)))
+    fx = CurrencyService.get_exchange_rates_bulk({h.currency for h in holdings} - {"CAD"}, "CAD", db)
 
     total_realized_gain_cad = Decimal("0")
     total_proceeds_cad = Decimal("0")
@@ -757,29 +896,30 @@ async def get_realized_gains(db: Session = Depends(get_db)) -> Dict:
     by_year = defaultdict(lambda: Decimal("0"))
 
     for holding in holdings:
-        # Get all transactions for this holding, ordered by date and id
-        transactions = db.query(Transaction).filter(
-            Transaction.holding_id == holding.id
-        ).order_by(Transaction.transaction_date.asc(), Transaction.id.asc()).all()
+        # All transactions for this holding, ordered by date and id
+        transactions = txns_by_holding.get(holding.id)
 
         if not transactions:
             continue
 
-        # FIFO: Track lots as a list of (quantity, price_per_share, fees)
-        fifo_lots = []
+        # FIFO: Track lots as a queue of (quantity, price_per_share, fees)
+        # One CAD rate per holding (1 for CAD, or when no rate is available)
+        rate = fx.get(holding.currency) or Decimal("1")
+
+        fifo_lots = deque()  # oldest lot on the left; popleft is O(1)
         holding_realized_gain = Decimal("0")
         holding_proceeds = Decimal("0")
         holding_cost_basis = Decimal("0")
         sell_transactions = []
 
         for txn in transactions:
-            txn_quantity = Decimal(str(txn.quantity))
-            txn_price = Decimal(str(txn.price_per_share))
-            txn_fees = Decimal(str(txn.fees)) if txn.fees else Decimal("0")
+            # Numeric columns already load as Decimal; no str() round-trip needed
+            txn_quantity = txn.quantity
+            txn_price = txn.price_per_share
+            txn_fees = txn.fees or Decimal("0")
 
             # Check if this is part of a round-trip (account transfer)
-            is_round_trip = (holding.symbol, txn.transaction_date,
-                           float(txn_quantity), float(txn_price)) in round_trips
+            is_round_trip = (holding.symbol, txn.transaction_date) + round_trip_key(txn_quantity, txn_price) in round_trips
 
             if txn.transaction_type == "BUY":
                 # Add new lot to FIFO queue (skip if round-trip)
@@ -811,7 +951,7 @@ async def get_realized_gains(db: Session = Depends(get_db)) -> Dict:
                         cost_basis += lot["quantity"] * lot["price"] + lot["fees"]
                         lots_used.append(f"{lot['quantity']}@${lot['price']:.2f}")
                         remaining_to_sell -= lot["quantity"]
-                        fifo_lots.pop(0)
+                        fifo_lots.popleft()
                     else:
                         # Use partial lot
                         cost_basis += remaining_to_sell * lot["price"]
@@ -834,21 +974,10 @@ async def get_realized_gains(db: Session = Depends(get_db)) -> Dict:
                 # Track by year
                 year = txn.transaction_date.year
 
-                # Convert to CAD if needed
-                if holding.currency != "CAD":
-                    rate = CurrencyService.get_exchange_rate_sync(holding.currency, "CAD", db)
-                    if rate:
-                        realized_gain_cad = realized_gain * rate
-                        proceeds_cad = proceeds * rate
-                        cost_basis_cad_val = cost_basis * rate
-                    else:
-                        realized_gain_cad = realized_gain
-                        proceeds_cad = proceeds
-                        cost_basis_cad_val = cost_basis
-                else:
-                    realized_gain_cad = realized_gain
-                    proceeds_cad = proceeds
-                    cost_basis_cad_val = cost_basis
+                # Convert to CAD
+                realized_gain_cad = realized_gain * rate
+                proceeds_cad = proceeds * rate
+                cost_basis_cad_val = cost_basis * rate
 
                 by_year[year] += realized_gain_cad
                 total_realized_gain_cad += realized_gain_cad
@@ -872,14 +1001,7 @@ async def get_realized_gains(db: Session = Depends(get_db)) -> Dict:
         # Only add holdings with sell transactions
         if sell_transactions:
             # Convert holding totals to CAD
-            if holding.currency != "CAD":
-                rate = CurrencyService.get_exchange_rate_sync(holding.currency, "CAD", db)
-                if rate:
-                    holding_realized_gain_cad = holding_realized_gain * rate
-                else:
-                    holding_realized_gain_cad = holding_realized_gain
-            else:
-                holding_realized_gain_cad = holding_realized_gain
+            holding_realized_gain_cad = holding_realized_gain * rate
 
             by_holding.append({
                 "symbol": holding.symbol,
@@ -906,9 +1028,26 @@ async def get_realized_gains(db: Session = Depends(get_db)) -> Dict:
     }
 
 
+def empty_recommendations(generated_at: datetime) -> Dict:
+    """Recommendations response when there is nothing to evaluate."""
+    return {
+        "recommendations": [],
+        "health_score": 100,
+        "health_grade": "A",
+        "summary": {
+            "take_profit": 0,
+            "review": 0,
+            "rebalance": 0,
+            "watch": 0
+        },
+        "generated_at": generated_at
+    }
+
+
 @router.get("/recommendations")
-async def get_recommendations(
+def get_recommendations(
     db: Session = Depends(get_db),
+    holdings: List[Holding] = Depends(get_active_holdings),
     fast: bool = Query(True, description="Use cached prices for faster response")
 ) -> Dict:
     """
@@ -922,21 +1061,10 @@ async def get_recommendations(
     
     Also returns a portfolio health score (0-100).
     """
-    holdings = db.query(Holding).filter(Holding.is_active == True).all()
-    
+    now = utc_now()  # one timestamp for the whole response
+
     if not holdings:
-        return {
-            "recommendations": [],
-            "health_score": 100,
-            "health_grade": "A",
-            "summary": {
-                "take_profit": 0,
-                "review": 0,
-                "rebalance": 0,
-                "watch": 0
-            },
-            "generated_at": datetime.now()
-        }
+        return empty_recommendations(now)
     
     # Get prices - prefer cache for speed
     if fast:
@@ -945,154 +1073,161 @@ async def get_recommendations(
     else:
         symbols = [(h.symbol, h.exchange) for h in holdings]
         price_data = PriceService.get_prices_with_change_bulk(symbols)
-        current_prices = {sym: data['price'] for sym, data in price_data.items()}
+        current_prices = key_prices_by_holding(
+            holdings, {sym: data['price'] for sym, data in price_data.items()}
+        )
     
-    # Calculate portfolio total and per-holding metrics
-    total_value = Decimal("0")
-    holdings_data = []
-    
-    for holding in holdings:
-        price = current_prices.get(holding.symbol)
-        if price is None:
-            continue
-        
-        market_value = holding.quantity * price
-        cost_basis = holding.quantity * holding.avg_purchase_price
-        
-        # Convert to CAD
-        if holding.currency != "CAD":
-            rate = CurrencyService.get_exchange_rate_sync(holding.currency, "CAD", db)
-            if rate:
-                market_value_cad = market_value * rate
-                cost_basis_cad = cost_basis * rate
-            else:
-                market_value_cad = market_value
-                cost_basis_cad = cost_basis
-        else:
-            market_value_cad = market_value
-            cost_basis_cad = cost_basis
-        
-        gain_pct = ((market_value_cad - cost_basis_cad) / cost_basis_cad * 100) if cost_basis_cad > 0 else Decimal("0")
-        
-        # Get daily change if available
-        day_change_pct = Decimal("0")
-        if price_data and holding.symbol in price_data:
-            change_pct = price_data[holding.symbol].get('change_pct')
-            if change_pct:
-                day_change_pct = change_pct
-        
-        total_value += market_value_cad
-        
-        holdings_data.append({
+    fx = CurrencyService.get_exchange_rates_bulk({h.currency for h in holdings} - {"CAD"}, "CAD", db)
+
+    # Holdings without a price are left out of recommendations
+    priced = [
+        (holding, price) for holding in holdings
+        if (price := current_prices.get((holding.symbol, holding.exchange))) is not None
+    ]
+    if not priced:
+        # Cold price cache: nothing to evaluate, so answer right away and flag the data as stale
+        return {**empty_recommendations(now), "source": "stale"}
+    changes = price_data or {}
+
+    # Per-holding metrics as float64 arrays, one element per priced holding
+    quantity = np.array([float(h.quantity) for h, _ in priced], dtype=float)
+    prices = np.array([float(p) for _, p in priced], dtype=float)
+    avg_cost = np.array([float(h.avg_purchase_price) for h, _ in priced], dtype=float)
+    fx_rate = np.array([fx_multiplier(h.currency, fx) for h, _ in priced], dtype=float)
+    day_change_pct = np.array(
+        [float(changes.get(h.symbol, {}).get('change_pct') or 0.0) for h, _ in priced], dtype=float
+    )
+
+    market_value_cad = quantity * prices * fx_rate
+    cost_basis_cad = quantity * avg_cost * fx_rate
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gain_pct = np.where(cost_basis_cad > 0, (market_value_cad - cost_basis_cad) / cost_basis_cad * 100, 0.0)
+    total_value = float(market_value_cad.sum())
+
+    holdings_data = [
+        {
             "symbol": holding.symbol,
             "company_name": holding.company_name,
-            "market_value_cad": market_value_cad,
-            "cost_basis_cad": cost_basis_cad,
-            "gain_pct": float(gain_pct),
-            "day_change_pct": float(day_change_pct),
+            "market_value_cad": mv,
+            "cost_basis_cad": cb,
+            "gain_pct": gp,
+            "day_change_pct": dc,
             "currency": holding.currency,
             "exchange": holding.exchange,
             "country": holding.country
-        })
-    
-    # Calculate allocation percentages
-    for h in holdings_data:
-        h["allocation_pct"] = float(h["market_value_cad"] / total_value * 100) if total_value > 0 else 0
+        }
+        for (holding, _), mv, cb, gp, dc in zip(
+            priced, market_value_cad.tolist(), cost_basis_cad.tolist(), gain_pct.tolist(), day_change_pct.tolist()
+        )
+    ]
     
     # Generate recommendations
     recommendations = []
     health_deductions = 0
+
+    # Allocation percentages in one array division rather than a second pass over holdings_data
+    allocation_pct = market_value_cad / total_value * 100 if total_value > 0 else np.zeros(len(priced))
+
+    # Weight factor based on portfolio allocation
+    # Small positions (<2%) have minimal impact, large positions (>10%) have full impact
+    weight = np.clip(allocation_pct / 5, 0.1, 1.0)  # 0.1 to 1.0 scale
+
+    # Portfolio impact = % loss × allocation %
+    # e.g., -50% on 1% position = 0.5% impact, -10% on 10% position = 1% impact
+    portfolio_impact = np.abs(gain_pct) * allocation_pct / 100
+
+    # Each rule is a mask over all holdings; only the (usually few) holdings that trip it are visited
+    gains = gain_pct.tolist()
+    allocations = allocation_pct.tolist()
+    day_changes = day_change_pct.tolist()
+    weights = weight.tolist()
+    impacts = portfolio_impact.tolist()
+
+    # Take profit: >40% gain
+    for i in np.flatnonzero(gain_pct > 40).tolist():
+        h = holdings_data[i]
+        severity = "high" if gains[i] > 80 else "medium"
+        recommendations.append({
+            "type": "take_profit",
+            "symbol": h["symbol"],
+            "company_name": h["company_name"],
+            "title": f"Consider taking profits on {h['symbol']}",
+            "description": f"Up {gains[i]:.1f}% from cost basis ({allocations[i]:.1f}% of portfolio). Consider trimming.",
+            "metric": gains[i],
+            "metric_label": "Total Return",
+            "severity": severity,
+            "icon": "trending-up"
+        })
+        # Weight by position size - big winners in large positions matter more
+        base_deduction = 2 if gains[i] > 80 else 1
+        health_deductions += base_deduction * weights[i]
+
+    # Review: >20% loss - WEIGHTED BY PORTFOLIO IMPACT
+    for i in np.flatnonzero(gain_pct < -20).tolist():
+        h = holdings_data[i]
+        impact = impacts[i]
+        severity = "high" if impact > 2 else ("medium" if impact > 0.5 else "low")
+        recommendations.append({
+            "type": "review",
+            "symbol": h["symbol"],
+            "company_name": h["company_name"],
+            "title": f"Review your {h['symbol']} position",
+            "description": f"Down {abs(gains[i]):.1f}% ({allocations[i]:.1f}% of portfolio = {impact:.2f}% impact).",
+            "metric": gains[i],
+            "metric_label": "Total Return",
+            "severity": severity,
+            "icon": "alert-triangle"
+        })
+        # Weight heavily by portfolio impact, not just percentage loss
+        # A -50% on 0.5% position = 0.25% impact (minor)
+        # A -20% on 10% position = 2% impact (significant)
+        if impact > 2:
+            health_deductions += 5  # Significant portfolio damage
+        elif impact > 1:
+            health_deductions += 3  # Moderate impact
+        elif impact > 0.5:
+            health_deductions += 1  # Minor impact
+        # Tiny positions (<0.5% impact) = no health penalty
+
+    # Rebalance: >12% of portfolio
+    for i in np.flatnonzero(allocation_pct > 12).tolist():
+        h = holdings_data[i]
+        severity = "high" if allocations[i] > 20 else "medium"
+        recommendations.append({
+            "type": "rebalance",
+            "symbol": h["symbol"],
+            "company_name": h["company_name"],
+            "title": f"{h['symbol']} is overweight",
+            "description": f"At {allocations[i]:.1f}% of portfolio. Consider rebalancing for diversification.",
+            "metric": allocations[i],
+            "metric_label": "Portfolio Weight",
+            "severity": severity,
+            "icon": "pie-chart"
+        })
+        health_deductions += 3 if allocations[i] > 20 else 1
+
+    # Watch: Big daily move (>3%)
+    for i in np.flatnonzero(np.abs(day_change_pct) > 3).tolist():
+        h = holdings_data[i]
+        direction = "up" if day_changes[i] > 0 else "down"
+        icon = "trending-up" if day_changes[i] > 0 else "trending-down"
+        recommendations.append({
+            "type": "watch",
+            "symbol": h["symbol"],
+            "company_name": h["company_name"],
+            "title": f"{h['symbol']} moved {direction} {abs(day_changes[i]):.1f}% today",
+            "description": f"Check for news or earnings announcements.",
+            "metric": day_changes[i],
+            "metric_label": "Day Change",
+            "severity": "low",
+            "icon": icon
+        })
     
-    for h in holdings_data:
-        # Weight factor based on portfolio allocation
-        # Small positions (<2%) have minimal impact, large positions (>10%) have full impact
-        weight = min(1.0, max(0.1, h["allocation_pct"] / 5))  # 0.1 to 1.0 scale
-        
-        # Portfolio impact = % loss × allocation %
-        # e.g., -50% on 1% position = 0.5% impact, -10% on 10% position = 1% impact
-        portfolio_impact = abs(h["gain_pct"]) * h["allocation_pct"] / 100
-        
-        # Take profit: >40% gain
-        if h["gain_pct"] > 40:
-            severity = "high" if h["gain_pct"] > 80 else "medium"
-            recommendations.append({
-                "type": "take_profit",
-                "symbol": h["symbol"],
-                "company_name": h["company_name"],
-                "title": f"Consider taking profits on {h['symbol']}",
-                "description": f"Up {h['gain_pct']:.1f}% from cost basis ({h['allocation_pct']:.1f}% of portfolio). Consider trimming.",
-                "metric": h["gain_pct"],
-                "metric_label": "Total Return",
-                "severity": severity,
-                "icon": "trending-up"
-            })
-            # Weight by position size - big winners in large positions matter more
-            base_deduction = 2 if h["gain_pct"] > 80 else 1
-            health_deductions += base_deduction * weight
-        
-        # Review: >20% loss - WEIGHTED BY PORTFOLIO IMPACT
-        if h["gain_pct"] < -20:
-            severity = "high" if portfolio_impact > 2 else ("medium" if portfolio_impact > 0.5 else "low")
-            recommendations.append({
-                "type": "review",
-                "symbol": h["symbol"],
-                "company_name": h["company_name"],
-                "title": f"Review your {h['symbol']} position",
-                "description": f"Down {abs(h['gain_pct']):.1f}% ({h['allocation_pct']:.1f}% of portfolio = {portfolio_impact:.2f}% impact).",
-                "metric": h["gain_pct"],
-                "metric_label": "Total Return",
-                "severity": severity,
-                "icon": "alert-triangle"
-            })
-            # Weight heavily by portfolio impact, not just percentage loss
-            # A -50% on 0.5% position = 0.25% impact (minor)
-            # A -20% on 10% position = 2% impact (significant)
-            if portfolio_impact > 2:
-                health_deductions += 5  # Significant portfolio damage
-            elif portfolio_impact > 1:
-                health_deductions += 3  # Moderate impact
-            elif portfolio_impact > 0.5:
-                health_deductions += 1  # Minor impact
-            # Tiny positions (<0.5% impact) = no health penalty
-        
-        # Rebalance: >12% of portfolio
-        if h["allocation_pct"] > 12:
-            severity = "high" if h["allocation_pct"] > 20 else "medium"
-            recommendations.append({
-                "type": "rebalance",
-                "symbol": h["symbol"],
-                "company_name": h["company_name"],
-                "title": f"{h['symbol']} is overweight",
-                "description": f"At {h['allocation_pct']:.1f}% of portfolio. Consider rebalancing for diversification.",
-                "metric": h["allocation_pct"],
-                "metric_label": "Portfolio Weight",
-                "severity": severity,
-                "icon": "pie-chart"
-            })
-            health_deductions += 3 if h["allocation_pct"] > 20 else 1
-        
-        # Watch: Big daily move (>3%)
-        if abs(h["day_change_pct"]) > 3:
-            direction = "up" if h["day_change_pct"] > 0 else "down"
-            icon = "trending-up" if h["day_change_pct"] > 0 else "trending-down"
-            recommendations.append({
-                "type": "watch",
-                "symbol": h["symbol"],
-                "company_name": h["company_name"],
-                "title": f"{h['symbol']} moved {direction} {abs(h['day_change_pct']):.1f}% today",
-                "description": f"Check for news or earnings announcements.",
-                "metric": h["day_change_pct"],
-                "metric_label": "Day Change",
-                "severity": "low",
-                "icon": icon
-            })
-    
-    # Check country concentration
-    country_allocation = defaultdict(float)
-    for h in holdings_data:
-        country_allocation[h["country"]] += h["allocation_pct"]
+    # Check country concentration: sum allocation per country code in one bincount
+    countries, country_idx = np.unique([h["country"] for h in holdings_data], return_inverse=True)
+    country_allocation = np.bincount(country_idx, weights=allocation_pct, minlength=len(countries))
     
-    for country, pct in country_allocation.items():
+    for country, pct in zip(countries.tolist(), country_allocation.tolist()):
         if pct > 70:
             recommendations.append({
                 "type": "rebalance",
@@ -1156,16 +1291,21 @@ async def get_recommendations(
     else:
         health_grade = "F"
     
-    # Sort recommendations by severity
-    severity_order = {"high": 0, "medium": 1, "low": 2}
-    recommendations.sort(key=lambda x: severity_order.get(x["severity"], 3))
+    # Order recommendations by severity: there are only three levels, so bucket them
+    # (keeps each level in insertion order, same as the stable sort it replaces)
+    by_severity = {"high": [], "medium": [], "low": []}
+    unranked = []
+    for r in recommendations:
+        by_severity.get(r["severity"], unranked).append(r)
+    recommendations = by_severity["high"] + by_severity["medium"] + by_severity["low"] + unranked
     
     # Count by type
+    counts = Counter(r["type"] for r in recommendations)
     summary = {
-        "take_profit": len([r for r in recommendations if r["type"] == "take_profit"]),
-        "review": len([r for r in recommendations if r["type"] == "review"]),
-        "rebalance": len([r for r in recommendations if r["type"] == "rebalance"]),
-        "watch": len([r for r in recommendations if r["type"] == "watch"])
+        "take_profit": counts["take_profit"],
+        "review": counts["review"],
+        "rebalance": counts["rebalance"],
+        "watch": counts["watch"]
     }
     
     return {
@@ -1174,27 +1314,57 @@ async def get_recommendations(
         "health_grade": health_grade,
         "summary": summary,
         "total_recommendations": len(recommendations),
-        "generated_at": datetime.now()
+        "generated_at": now
     }
 
 
+def check_etag(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Tag the response for conditional GETs; returns a 304 to send instead
+    when the client already holds this version.
+    """
+    headers = {"ETag": etag, "Cache-Control": "max-age=60, must-revalidate"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+# (mtime_ns, parsed insights) for the last successful read of the insights file
+_insights_cache: Optional[Tuple[int, Dict]] = None
+
+
 @router.get("/insights")
-async def get_ai_insights(db: Session = Depends(get_db)) -> Dict:
+def get_ai_insights(request: Request, response: Response, db: Session = Depends(get_db)) -> Dict:
     """
     Get AI-generated insights about the portfolio.
     
     Insights are generated by Nix (Claude) and cached in a file.
     This endpoint returns the cached insights.
     """
-    import json
     import os
     
+    global _insights_cache
+
     insights_file = "/app/data/portfolio-insights.json"
-    
-    if os.path.exists(insights_file):
+
+    try:
+        mtime_ns = os.stat(insights_file).st_mtime_ns
+    except FileNotFoundError:
+        mtime_ns = None
+
+    if mtime_ns is not None:
+        not_modified = check_etag(request, response, f'"{mtime_ns}"')
+        if not_modified:
+            return not_modified
+
+        # Re-parse only when the file has been rewritten since the last read
+        if _insights_cache is not None and _insights_cache[0] == mtime_ns:
+            return _insights_cache[1]
         try:
-            with open(insights_file, 'r') as f:
-                data = json.load(f)
+            with open(insights_file, 'rb') as f:
+                data = orjson.loads(f.read())
+            _insights_cache = (mtime_ns, data)
             return data
         except Exception as e:
             logger.error(f"Failed to load insights: {e}")
@@ -1207,8 +1377,11 @@ async def get_ai_insights(db: Session = Depends(get_db)) -> Dict:
 
 
 @router.get("/account-breakdown")
-async def get_account_breakdown(
+def get_account_breakdown(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
+    holdings: List[Holding] = Depends(get_active_holdings),
     fast: bool = Query(True, description="Use cached prices for faster response")
 ) -> Dict:
     """
@@ -1219,9 +1392,20 @@ async def get_account_breakdown(
     - Contribution room tracking
     - Account rebalancing decisions
     """
-    from ..models.holding import ACCOUNT_TYPES
+    fx = load_cad_rates({h.currency for h in holdings} - {"CAD"})
 
-    holdings = db.query(Holding).filter(Holding.is_active == True).all()
+    if fast:
+        # Cached-price responses only change when prices, holdings or FX rates change
+        prices_updated, holdings_updated = db.query(
+            select(func.max(CurrentPriceCache.updated_at)).scalar_subquery(),
+            select(func.max(Holding.updated_at)).scalar_subquery()
+        ).one()
+        rates = ",".join(f"{currency}={rate}" for currency, rate in sorted(fx.items()))
+        version = f"{prices_updated}|{holdings_updated}|{len(holdings)}|{rates}"
+        etag = f'"{hashlib.sha1(version.encode()).hexdigest()[:16]}"'
+        not_modified = check_etag(request, response, etag)
+        if not_modified:
+            return not_modified
 
     if not holdings:
         return {
@@ -1238,73 +1422,47 @@ async def get_account_breakdown(
         current_prices = get_prices_from_cache(db, holdings)
     else:
         symbols = [(h.symbol, h.exchange) for h in holdings]
-        current_prices = get_prices_with_dedup(symbols, with_change=False)
+        current_prices = key_prices_by_holding(holdings, from_thread.run(get_prices_with_dedup, symbols, False))
         save_prices_to_db_cache(db, holdings, current_prices)
 
-    # Account types that are tax-advantaged
-    TAX_ADVANTAGED = {"TFSA", "RRSP", "SDRSP", "FHSA", "RESP", "LIRA", "RRIF", "PPF_INDIA"}
-
-    # Calculate breakdown
+    # Calculate breakdown (float math: these are display totals, not tax figures)
     by_account = defaultdict(lambda: {
-        "value_cad": Decimal("0"),
-        "cost_cad": Decimal("0"),
+        "value_cad": 0.0,
+        "cost_cad": 0.0,
         "holdings_count": 0,
         "holdings": []
     })
 
-    total_value = Decimal("0")
-    tax_advantaged_total = Decimal("0")
-    taxable_total = Decimal("0")
+    total_value = 0.0
+    tax_advantaged_total = 0.0
+    taxable_total = 0.0
 
     for holding in holdings:
-        price = current_prices.get(holding.symbol)
+        price = current_prices.get((holding.symbol, holding.exchange))
+        quantity = float(holding.quantity)
         
         # For holdings without live prices (e.g., mutual funds), use snapshot or cost basis
         if price is None:
-            # Try to extract snapshot value from notes if available
-            # Format: "... | Snapshot: ₹XXX,XXX | ..."
-            snapshot_value = None
-            if holding.notes and "Snapshot:" in holding.notes:
-                import re
-                match = re.search(r'Snapshot: ₹([\d,]+)', holding.notes)
-                if match:
-                    try:
-                        snapshot_value = Decimal(match.group(1).replace(',', ''))
-                    except:
-                        pass
-            
-            if snapshot_value:
-                market_value = snapshot_value
-            else:
-                # Fall back to cost basis
-                market_value = holding.quantity * holding.avg_purchase_price
+            market_value = snapshot_value_from_notes(holding) or quantity * float(holding.avg_purchase_price)
         else:
-            market_value = holding.quantity * price
+            market_value = quantity * float(price)
         
-        cost_basis = holding.quantity * holding.avg_purchase_price
-
         # Convert to CAD
-        if holding.currency != "CAD":
-            rate = CurrencyService.get_exchange_rate_sync(holding.currency, "CAD", db)
-            if rate:
-                market_value = market_value * rate
-                cost_basis = cost_basis * rate
+        market_value *= fx_multiplier(holding.currency, fx)
 
         total_value += market_value
 
         # Use account_type or default to "UNASSIGNED"
         account_type = holding.account_type or "UNASSIGNED"
-        account_name = ACCOUNT_TYPES.get(account_type, account_type)
+        account = by_account[account_type]
 
-        by_account[account_type]["value_cad"] += market_value
-        by_account[account_type]["cost_cad"] += cost_basis
-        by_account[account_type]["holdings_count"] += 1
-        by_account[account_type]["name"] = account_name
-        by_account[account_type]["holdings"].append({
+        account["value_cad"] += market_value
+        account["holdings_count"] += 1
+        account["holdings"].append({
             "symbol": holding.symbol,
             "company_name": holding.company_name,
-            "value_cad": float(market_value),
-            "quantity": float(holding.quantity)
+            "value_cad": market_value,
+            "quantity": quantity
         })
 
         # Track tax-advantaged vs taxable
@@ -1313,33 +1471,46 @@ async def get_account_breakdown(
         else:
             taxable_total += market_value
 
+    # Cost basis needs no prices, so the database sums it per (account type, currency);
+    # only the FX conversion of those few totals happens here
+    cost_rows = db.query(
+        Holding.account_type,
+        Holding.currency,
+        func.sum(Holding.quantity * Holding.avg_purchase_price, type_=Float)
+    ).filter(Holding.is_active == True).group_by(Holding.account_type, Holding.currency).all()
+    for account_type, currency, cost in cost_rows:
+        by_account[account_type or "UNASSIGNED"]["cost_cad"] += (cost or 0.0) * fx_multiplier(currency, fx)
+
     # Convert to response format with percentages
     result = {}
+    by_value = operator.itemgetter("value_cad")
     for account_type, data in by_account.items():
+        # Every holding is returned, so this stays a full sort, done in place
+        data["holdings"].sort(key=by_value, reverse=True)
         gain = data["value_cad"] - data["cost_cad"]
-        gain_pct = (gain / data["cost_cad"] * 100) if data["cost_cad"] > 0 else Decimal("0")
-        allocation_pct = (data["value_cad"] / total_value * 100) if total_value > 0 else Decimal("0")
+        gain_pct = (gain / data["cost_cad"] * 100) if data["cost_cad"] > 0 else 0.0
+        allocation_pct = (data["value_cad"] / total_value * 100) if total_value > 0 else 0.0
 
         result[account_type] = {
-            "name": data.get("name", account_type),
-            "value_cad": float(data["value_cad"]),
-            "cost_cad": float(data["cost_cad"]),
-            "gain_cad": float(gain),
-            "gain_pct": float(gain_pct),
-            "allocation_pct": float(allocation_pct),
+            "name": ACCOUNT_TYPES.get(account_type, account_type),
+            "value_cad": data["value_cad"],
+            "cost_cad": data["cost_cad"],
+            "gain_cad": gain,
+            "gain_pct": gain_pct,
+            "allocation_pct": allocation_pct,
             "holdings_count": data["holdings_count"],
-            "holdings": sorted(data["holdings"], key=lambda x: x["value_cad"], reverse=True),
+            "holdings": data["holdings"],
             "is_tax_advantaged": account_type in TAX_ADVANTAGED
         }
 
-    tax_advantaged_pct = (tax_advantaged_total / total_value * 100) if total_value > 0 else Decimal("0")
+    tax_advantaged_pct = (tax_advantaged_total / total_value * 100) if total_value > 0 else 0.0
 
     return {
         "by_account_type": result,
-        "tax_advantaged_total": float(tax_advantaged_total),
-        "taxable_total": float(taxable_total),
-        "tax_advantaged_pct": float(tax_advantaged_pct),
-        "total_value_cad": float(total_value),
+        "tax_advantaged_total": tax_advantaged_total,
+        "taxable_total": taxable_total,
+        "tax_advantaged_pct": tax_advantaged_pct,
+        "total_value_cad": total_value,
         "account_types_available": list(ACCOUNT_TYPES.keys()),
         "source": "cache" if fast else "live"
     }
@@ -1355,13 +1526,14 @@ def get_exchange_rates(
     Rates are cached for 24 hours to avoid excessive API calls.
     """
     target_currencies = ["USD", "CAD", "INR"]
+    pair_rates = CurrencyService.get_exchange_rate_pairs([(base, t) for t in target_currencies], db)
     rates = {}
     
     for target in target_currencies:
         if target == base:
             rates[target] = 1.0
         else:
-            rate = CurrencyService.get_exchange_rate_sync(base, target, db)
+            rate = pair_rates.get((base, target))
             rates[target] = float(rate) if rate else None
     
     return {
@@ -4,6 +4,7 @@ from typing import List, Optional
 from ..database import get_db
 from ..models.holding import Holding, ACCOUNT_TYPES
 from ..schemas.holding import HoldingCreate, HoldingUpdate, HoldingResponse
+from .prices import invalidate_active_holdings
 from datetime import datetime
 
 router = APIRouter(prefix="/holdings", tags=["holdings"])
@@ -82,6 +83,7 @@ def create_holding(holding: HoldingCreate, db: Session = Depends(get_db)):
     db_holding = Holding(**holding.model_dump())
     db.add(db_holding)
     db.commit()
+    invalidate_active_holdings()
     db.refresh(db_holding)
 
     return db_holding
@@ -112,6 +114,7 @@ def update_holding(
 
     db_holding.updated_at = datetime.utcnow()
     db.commit()
+    invalidate_active_holdings()
     db.refresh(db_holding)
 
     return db_holding
@@ -135,5 +138,6 @@ def delete_holding(holding_id: int, db: Session = Depends(get_db)):
     db_holding.is_active = False
     db_holding.updated_at = datetime.utcnow()
     db.commit()
+    invalidate_active_holdings()
 
     return None
@@ -1,11 +1,16 @@
 """
 Import router for handling CSV file imports from various brokers.
 """
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Response, status, UploadFile, File, Form
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from pydantic import BaseModel
+from dataclasses import dataclass, field
 from decimal import Decimal
+from functools import lru_cache
+import asyncio
+import io
+import orjson
 
 from ..database import get_db
 from ..schemas.import_schema import (
@@ -16,9 +21,23 @@ from ..schemas.import_schema import (
     ImportResult,
     SupportedFormat,
 )
-from ..services.import_service import ImportService
+from ..services.import_service import CSV_SNIFF_SIZE, ImportService
 from ..services.kite_import_service import KiteImportService
 from ..models.holding import Holding
+from .prices import invalidate_active_holdings
+
+
+@dataclass(slots=True)
+class BulkImportTotals:
+    """Running totals across the files of a bulk upload; validated into ImportResult once."""
+    success: bool = True
+    transactions_imported: int = 0
+    holdings_created: int = 0
+    holdings_updated: int = 0
+    duplicates_skipped: int = 0
+    account_types_updated: int = 0
+    errors: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
 
 
 class KiteImportRequest(BaseModel):
@@ -39,10 +58,17 @@ class KiteImportResult(BaseModel):
 router = APIRouter(prefix="/import", tags=["import"])
 
 
+@lru_cache(maxsize=1)
+def supported_formats_json() -> bytes:
+    """The static format list, serialized once."""
+    return orjson.dumps([f.model_dump() for f in ImportService.get_supported_formats()])
+
+
 @router.get("/formats", response_model=List[SupportedFormat])
 def get_supported_formats():
     """Get list of supported import formats."""
-    return ImportService.get_supported_formats()
+    # Returning a Response skips per-request validation; response_model still documents it
+    return Response(content=supported_formats_json(), media_type="application/json")
 
 
 @router.post("/preview", response_model=ImportPreviewResponse)
@@ -59,6 +85,10 @@ def preview_import(
     - Existing symbols that will update holdings
     - Potential duplicate transactions
     """
+    problem = ImportService.csv_head_problem(ImportService.content_head(request.file_content))
+    if problem:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=problem)
+
     try:
         return ImportService.preview_import(
             db=db,
@@ -92,6 +122,7 @@ def import_transactions(
             account_type=request.account_type,
             skip_duplicates=request.skip_duplicates,
         )
+        invalidate_active_holdings()
 
         if not result.success:
             raise HTTPException(
@@ -131,16 +162,17 @@ async def upload_and_import(
         )
 
     try:
-        content = await file.read()
-        content_str = content.decode('utf-8')
+        # Decode as the CSV reader consumes it rather than holding bytes and str copies
+        content = io.TextIOWrapper(file.file, encoding='utf-8', newline='')
 
         result = ImportService.import_transactions(
             db=db,
-            content=content_str,
+            content=content,
             platform=platform,
             account_type=account_type,
             skip_duplicates=skip_duplicates,
         )
+        invalidate_active_holdings()
 
         if not result.success:
             raise HTTPException(
@@ -183,13 +215,20 @@ async def upload_and_preview(
             detail="Only CSV files are supported"
         )
 
+    # Peek at the first few KB and rewind, so obviously bad files fail before parsing
+    head = file.file.read(CSV_SNIFF_SIZE)
+    file.file.seek(0)
+    problem = ImportService.csv_head_problem(head.decode('utf-8', errors='ignore'))
+    if problem:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=problem)
+
     try:
-        content = await file.read()
-        content_str = content.decode('utf-8')
+        # Decode as the CSV reader consumes it rather than holding bytes and str copies
+        content = io.TextIOWrapper(file.file, encoding='utf-8', newline='')
 
         return ImportService.preview_import(
             db=db,
-            content=content_str,
+            content=content,
             platform=platform,
             account_type=account_type,
         )
@@ -227,25 +266,33 @@ async def upload_bulk_import(
                 detail=f"Only CSV files are supported. Got: {file.filename}"
             )
 
-    total_result = ImportResult(
-        success=True,
-        transactions_imported=0,
-        holdings_created=0,
-        holdings_updated=0,
-        duplicates_skipped=0,
-        account_types_updated=0,
-        errors=[],
-        warnings=[],
+    total_result = BulkImportTotals()
+
+    # Files are independent until they hit the database: stream-decode and parse them
+    # in worker threads at once, then save them one at a time on this session
+    parsed_files = await asyncio.gather(
+        *[
+            asyncio.to_thread(
+                ImportService.parse_file,
+                io.TextIOWrapper(file.file, encoding='utf-8', newline=''),
+                platform,
+                account_type
+            )
+            for file in files
+        ],
+        return_exceptions=True
     )
 
-    for file in files:
+    for file, parsed in zip(files, parsed_files):
         try:
-            content = await file.read()
-            content_str = content.decode('utf-8')
+            if isinstance(parsed, Exception):
+                raise parsed
+            transactions, warnings = parsed
 
-            result = ImportService.import_transactions(
+            result = ImportService.import_parsed_transactions(
                 db=db,
-                content=content_str,
+                transactions=transactions,
+                warnings=warnings,
                 platform=platform,
                 account_type=account_type,
                 skip_duplicates=skip_duplicates,
@@ -257,8 +304,8 @@ async def upload_bulk_import(
             total_result.holdings_updated += result.holdings_updated
             total_result.duplicates_skipped += result.duplicates_skipped
             total_result.account_types_updated += result.account_types_updated
-            total_result.errors.extend([f"{file.filename}: {e}" for e in result.errors])
-            total_result.warnings.extend([f"{file.filename}: {w}" for w in result.warnings])
+            total_result.errors.extend(f"{file.filename}: {e}" for e in result.errors)
+            total_result.warnings.extend(f"{file.filename}: {w}" for w in result.warnings)
 
             if not result.success:
                 total_result.success = False
@@ -270,7 +317,53 @@ async def upload_bulk_import(
             total_result.errors.append(f"{file.filename}: {str(e)}")
             total_result.success = False
 
-    return total_result
+    invalidate_active_holdings()
+    return ImportResult.model_validate(total_result)
+
+
+def save_kite_holdings(db: Session, holdings: list, account_type: str) -> Tuple[int, int]:
+    """
+    Create or update a holding for each aggregated Kite holding; the caller commits.
+
+    Existing rows are matched by symbol in one query, then written as one batched
+    INSERT and one batched UPDATE instead of per-object unit-of-work changes.
+    Returns (created, updated).
+    """
+    existing_ids = dict(
+        db.query(Holding.symbol, Holding.id).filter(
+            Holding.symbol.in_({h.symbol for h in holdings}),
+            Holding.account_type == account_type
+        ).all()
+    )
+
+    new_mappings = []
+    update_mappings = []
+    for h in holdings:
+        holding_id = existing_ids.get(h.symbol)
+        if holding_id is not None:
+            update_mappings.append({
+                "id": holding_id,
+                "quantity": h.quantity,
+                "avg_purchase_price": h.avg_cost,
+                "exchange": h.exchange,
+                "is_active": True,
+            })
+        else:
+            new_mappings.append({
+                "symbol": h.symbol,
+                "company_name": h.symbol,  # Will be enriched later
+                "exchange": h.exchange,
+                "country": "IN",
+                "quantity": h.quantity,
+                "avg_purchase_price": h.avg_cost,
+                "currency": "INR",
+                "account_type": account_type,
+                "is_active": True,
+            })
+
+    db.bulk_insert_mappings(Holding, new_mappings)
+    db.bulk_update_mappings(Holding, update_mappings)
+    return len(new_mappings), len(update_mappings)
 
 
 @router.post("/kite", response_model=KiteImportResult)
@@ -283,13 +376,14 @@ def import_kite_holdings(
     
     Aggregates buy/sell across multiple annual statement files
     to calculate current holdings with average cost basis.
+    Prefer /kite/upload, which takes the files as multipart and skips base64 entirely.
     """
     try:
-        # Decode all files
-        file_bytes = [KiteImportService.decode_base64(f) for f in request.file_contents]
-        
-        # Parse and aggregate holdings
-        holdings, warnings = KiteImportService.parse_multiple_files(file_bytes)
+        # Decode each file just before it is parsed, so only one decoded xlsx is held
+        # at a time. This is a sync handler, so the work already runs in the threadpool
+        holdings, warnings = KiteImportService.parse_multiple_files(
+            KiteImportService.decode_base64(f) for f in request.file_contents
+        )
         
         if not holdings:
             return KiteImportResult(
@@ -301,49 +395,22 @@ def import_kite_holdings(
                 holdings=[],
             )
         
-        created = 0
-        updated = 0
-        result_holdings = []
-        
-        for h in holdings:
-            # Check if holding exists
-            existing = db.query(Holding).filter(
-                Holding.symbol == h.symbol,
-                Holding.account_type == request.account_type
-            ).first()
-            
-            if existing:
-                # Update existing
-                existing.quantity = h.quantity
-                existing.avg_purchase_price = h.avg_cost
-                existing.exchange = h.exchange
-                existing.is_active = True
-                updated += 1
-            else:
-                # Create new holding
-                new_holding = Holding(
-                    symbol=h.symbol,
-                    company_name=h.symbol,  # Will be enriched later
-                    exchange=h.exchange,
-                    country="IN",
-                    quantity=h.quantity,
-                    avg_purchase_price=h.avg_cost,
-                    currency="INR",
-                    account_type=request.account_type,
-                    is_active=True,
-                )
-                db.add(new_holding)
-                created += 1
-            
-            result_holdings.append({
+        created, updated = save_kite_holdings(db, holdings, request.account_type)
+
+        # Invested value is the remaining cost basis
+        result_holdings = [
+            {
                 "symbol": h.symbol,
                 "exchange": h.exchange,
                 "quantity": float(h.quantity),
                 "avg_cost": float(h.avg_cost),
-                "total_invested": float(h.total_buy_value - h.total_sell_value + (h.quantity * h.avg_cost) - h.total_buy_value + (h.total_sell_qty * h.avg_cost)),
-            })
+                "invested_value": float(h.quantity * h.avg_cost),
+            }
+            for h in holdings
+        ]
         
         db.commit()
+        invalidate_active_holdings()
         
         return KiteImportResult(
             success=True,
@@ -382,14 +449,12 @@ async def upload_kite_files(
             )
     
     try:
-        # Read all files
-        file_bytes = []
-        for file in files:
-            content = await file.read()
-            file_bytes.append(content)
-        
-        # Parse and aggregate holdings
-        holdings, warnings = KiteImportService.parse_multiple_files(file_bytes)
+        # Parse and aggregate holdings in a worker thread; xlsx parsing is CPU-bound
+        # and would otherwise stall every other request on the event loop. The spooled
+        # upload files are handed over as-is rather than read into memory first
+        holdings, warnings = await asyncio.to_thread(
+            KiteImportService.parse_multiple_files, [file.file for file in files]
+        )
         
         if not holdings:
             return KiteImportResult(
@@ -401,49 +466,22 @@ async def upload_kite_files(
                 holdings=[],
             )
         
-        created = 0
-        updated = 0
-        result_holdings = []
-        
-        for h in holdings:
-            # Check if holding exists
-            existing = db.query(Holding).filter(
-                Holding.symbol == h.symbol,
-                Holding.account_type == account_type
-            ).first()
-            
-            if existing:
-                existing.quantity = h.quantity
-                existing.avg_purchase_price = h.avg_cost
-                existing.exchange = h.exchange
-                existing.is_active = True
-                updated += 1
-            else:
-                new_holding = Holding(
-                    symbol=h.symbol,
-                    company_name=h.symbol,
-                    exchange=h.exchange,
-                    country="IN",
-                    quantity=h.quantity,
-                    avg_purchase_price=h.avg_cost,
-                    currency="INR",
-                    account_type=account_type,
-                    is_active=True,
-                )
-                db.add(new_holding)
-                created += 1
-            
-            # Calculate invested value (remaining cost basis)
-            invested = float(h.quantity * h.avg_cost)
-            result_holdings.append({
+        created, updated = save_kite_holdings(db, holdings, account_type)
+
+        # Invested value is the remaining cost basis
+        result_holdings = [
+            {
                 "symbol": h.symbol,
                 "exchange": h.exchange,
                 "quantity": float(h.quantity),
                 "avg_cost": float(h.avg_cost),
-                "invested_value": invested,
-            })
+                "invested_value": float(h.quantity * h.avg_cost),
+            }
+            for h in holdings
+        ]
         
         db.commit()
+        invalidate_active_holdings()
         
         return KiteImportResult(
             success=True,
@@ -522,26 +560,24 @@ def import_groww_holdings(
         
         created = 0
         updated = 0
-        result_holdings = []
-        total_invested = Decimal("0")
-        total_current = Decimal("0")
-        total_returns = Decimal("0")
+
+        # Generate symbols (include folio to distinguish same fund in different accounts),
+        # then load the existing holdings for all of them in one query
+        symbols = [GrowwImportService.generate_symbol(h.scheme_name, h.amc, h.folio_no) for h in holdings]
+        existing_holdings = {
+            holding.symbol: holding for holding in db.query(Holding).filter(
+                Holding.symbol.in_(set(symbols)),
+                Holding.account_type == request.account_type
+            )
+        }
         
-        for h in holdings:
-            # Generate symbol (include folio to distinguish same fund in different accounts)
-            symbol = GrowwImportService.generate_symbol(h.scheme_name, h.amc, h.folio_no)
+        for h, symbol in zip(holdings, symbols):
             
             # Calculate avg price (NAV at purchase)
             avg_nav = h.invested_value / h.units if h.units > 0 else Decimal("0")
             
             # Check if holding exists
-            existing = db.query(Holding).filter(
-                Holding.symbol == symbol,
-                Holding.account_type == request.account_type
-            ).first()
-            
-            # Calculate P&L percentage
-            pnl_pct = (h.returns / h.invested_value * 100) if h.invested_value > 0 else Decimal("0")
+            existing = existing_holdings.get(symbol)
             
             # Store snapshot values in notes for reference
             notes = (
@@ -571,12 +607,9 @@ def import_groww_holdings(
                 )
                 db.add(new_holding)
                 created += 1
-            
-            total_invested += h.invested_value
-            total_current += h.current_value
-            total_returns += h.returns
-            
-            result_holdings.append({
+
+        result_holdings = [
+            {
                 "symbol": symbol,
                 "scheme_name": h.scheme_name,
                 "amc": h.amc,
@@ -585,11 +618,17 @@ def import_groww_holdings(
                 "invested_value": float(h.invested_value),
                 "current_value": float(h.current_value),
                 "returns": float(h.returns),
-                "returns_pct": float(pnl_pct),
+                "returns_pct": float(h.returns / h.invested_value * 100) if h.invested_value > 0 else 0.0,
                 "xirr": h.xirr,
-            })
+            }
+            for h, symbol in zip(holdings, symbols)
+        ]
+        total_invested = sum((h.invested_value for h in holdings), Decimal("0"))
+        total_current = sum((h.current_value for h in holdings), Decimal("0"))
+        total_returns = sum((h.returns for h in holdings), Decimal("0"))
         
         db.commit()
+        invalidate_active_holdings()
         
         # Calculate total returns percentage
         total_returns_pct = (total_returns / total_invested * 100) if total_invested > 0 else 0
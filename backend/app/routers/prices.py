@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
 from sqlalchemy.dialects.sqlite import insert as sqlite_upsert
-from typing import Dict, Optional
+from typing import Dict
 from datetime import datetime, date
-from decimal import Decimal
 from ..database import get_db
 from ..models.holding import Holding
 from ..models.price import PriceHistory, CurrentPriceCache
@@ -11,6 +11,7 @@ from ..services.price_service import PriceService
 from ..services.mock_price_service import MockPriceService
 from ..services.snapshot_service import SnapshotService
 from ..config import settings
+from ..utils.ttl_cache import TTLCache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -25,47 +26,79 @@ def get_price_service():
     return PriceService
 
 
+# (symbol, exchange, currency) rows of the active holdings, which is all the price
+# endpoints need; endpoints that add, edit or deactivate holdings invalidate it
+_active_holdings_cache = TTLCache(maxsize=1, ttl=30)
+
+
+def get_active_holding_rows(db: Session) -> list:
+    """Active holdings as lightweight column rows, reused for a few seconds between polls."""
+    rows = _active_holdings_cache.get("rows")
+    if rows is None:
+        rows = db.query(Holding.symbol, Holding.exchange, Holding.currency).filter(
+            Holding.is_active == True
+        ).all()
+        _active_holdings_cache["rows"] = rows
+    return rows
+
+
+def invalidate_active_holdings():
+    """Drop the cached active holdings after a change to the holdings table."""
+    _active_holdings_cache.clear()
+
+
+# INSERT ... ON CONFLICT on the (symbol, exchange) unique key: one statement whether
+# or not the row exists yet, executed once per batch of rows
+_upsert = sqlite_upsert(CurrentPriceCache.__table__)
+_PRICE_CACHE_UPSERT = _upsert.on_conflict_do_update(
+    index_elements=["symbol", "exchange"],
+    set_={
+        "price": _upsert.excluded.price,
+        "currency": _upsert.excluded.currency,
+        "updated_at": _upsert.excluded.updated_at,
+    },
+)
+
+_PRICE_HISTORY_INSERT = sqlite_upsert(PriceHistory.__table__).on_conflict_do_nothing(
+    index_elements=["symbol", "exchange", "date"]
+)
+
+
 def save_prices_to_cache(db: Session, holdings: list, prices: Dict):
     """Save fetched prices to the cache table for instant future loads."""
     now = datetime.now()
+
+    # Keyed by (symbol, exchange) so holdings in several accounts write once
+    rows = {}
     for holding in holdings:
         price = prices.get(holding.symbol)
         if price:
-            # Upsert: insert or update if exists
-            existing = db.query(CurrentPriceCache).filter(
-                CurrentPriceCache.symbol == holding.symbol,
-                CurrentPriceCache.exchange == holding.exchange
-            ).first()
-            
-            if existing:
-                existing.price = price
-                existing.currency = holding.currency
-                existing.updated_at = now
-            else:
-                cache_entry = CurrentPriceCache(
-                    symbol=holding.symbol,
-                    exchange=holding.exchange,
-                    price=price,
-                    currency=holding.currency,
-                    updated_at=now
-                )
-                db.add(cache_entry)
-    
+            rows[(holding.symbol, holding.exchange)] = {
+                "symbol": holding.symbol,
+                "exchange": holding.exchange,
+                "price": price,
+                "currency": holding.currency,
+                "updated_at": now
+            }
+    if not rows:
+        return
+
     try:
+        db.execute(_PRICE_CACHE_UPSERT, list(rows.values()))
         db.commit()
-        logger.info(f"Saved {len(prices)} prices to cache")
+        logger.info(f"Saved {len(rows)} prices to cache")
     except Exception as e:
         logger.error(f"Failed to save prices to cache: {e}")
         db.rollback()
 
 
 @router.get("/cached")
-async def get_cached_prices(db: Session = Depends(get_db)) -> Dict:
+def get_cached_prices(db: Session = Depends(get_db)) -> Dict:
     """
     Get cached prices from database - INSTANT response, no external API calls.
     Use this for initial page load, then refresh with /current in background.
     """
-    holdings = db.query(Holding).filter(Holding.is_active == True).all()
+    holdings = get_active_holding_rows(db)
     
     if not holdings:
         return {
@@ -76,13 +109,21 @@ async def get_cached_prices(db: Session = Depends(get_db)) -> Dict:
             "stale": True
         }
     
-    # Get all cached prices in one query
-    cached = db.query(CurrentPriceCache).filter(
-        CurrentPriceCache.symbol.in_([h.symbol for h in holdings])
-    ).all()
-    
-    # Build lookup dict
-    cache_lookup = {(c.symbol, c.exchange): c for c in cached}
+    # Get all cached prices in one query, matched on the exact (symbol, exchange)
+    # pairs and read as plain column rows
+    cache_lookup = {
+        (c.symbol, c.exchange): c for c in db.query(
+            CurrentPriceCache.symbol,
+            CurrentPriceCache.exchange,
+            CurrentPriceCache.price,
+            CurrentPriceCache.currency,
+            CurrentPriceCache.updated_at,
+        ).filter(
+            tuple_(CurrentPriceCache.symbol, CurrentPriceCache.exchange).in_(
+                [(h.symbol, h.exchange) for h in holdings]
+            )
+        )
+    }
     
     result = {}
     oldest_update = None
@@ -129,9 +170,9 @@ async def get_cached_prices(db: Session = Depends(get_db)) -> Dict:
 
 
 @router.get("/current")
-async def get_current_prices(db: Session = Depends(get_db)) -> Dict:
+def get_current_prices(db: Session = Depends(get_db)) -> Dict:
     """Get current prices for all active holdings (fetches from yfinance)"""
-    holdings = db.query(Holding).filter(Holding.is_active == True).all()
+    holdings = get_active_holding_rows(db)
 
     if not holdings:
         return {
@@ -167,7 +208,7 @@ async def get_current_prices(db: Session = Depends(get_db)) -> Dict:
 
 
 @router.get("/{symbol}")
-async def get_price_by_symbol(
+def get_price_by_symbol(
     symbol: str,
     exchange: str = "TSX",
     db: Session = Depends(get_db)
@@ -190,36 +231,31 @@ async def get_price_by_symbol(
 
 
 @router.post("/refresh")
-async def refresh_prices(db: Session = Depends(get_db)) -> Dict:
+def refresh_prices(db: Session = Depends(get_db)) -> Dict:
     """Force refresh all prices (clear cache and fetch new)"""
     PriceService.clear_cache()
+    invalidate_active_holdings()
 
-    holdings = db.query(Holding).filter(Holding.is_active == True).all()
+    holdings = get_active_holding_rows(db)
     symbols = [(h.symbol, h.exchange) for h in holdings]
     prices = PriceService.get_prices_bulk(symbols)
 
-    # Store in price history
+    # Store in price history; rows already recorded for today are left alone by the
+    # (symbol, exchange, date) unique constraint, so no per-holding existence check
     today = date.today()
+    rows = {}
     for holding in holdings:
         price = prices.get(holding.symbol)
         if price:
-            # Check if we already have today's price
-            existing = db.query(PriceHistory).filter(
-                PriceHistory.symbol == holding.symbol,
-                PriceHistory.exchange == holding.exchange,
-                PriceHistory.date == today
-            ).first()
-
-            if not existing:
-                price_history = PriceHistory(
-                    symbol=holding.symbol,
-                    exchange=holding.exchange,
-                    date=today,
-                    close=price
-                )
-                db.add(price_history)
-
-    db.commit()
+            rows[(holding.symbol, holding.exchange)] = {
+                "symbol": holding.symbol,
+                "exchange": holding.exchange,
+                "date": today,
+                "close": price
+            }
+    if rows:
+        db.execute(_PRICE_HISTORY_INSERT, list(rows.values()))
+        db.commit()
 
     # Create a portfolio snapshot after refreshing prices
     try:
@@ -239,48 +275,44 @@ async def refresh_prices(db: Session = Depends(get_db)) -> Dict:
 
 
 @router.get("/history/{symbol}")
-async def get_price_history(
+def get_price_history(
     symbol: str,
     exchange: str = "TSX",
     days: int = 30,
     db: Session = Depends(get_db)
 ) -> Dict:
     """Get historical prices for a symbol"""
-    # Try to fetch from yfinance
-    historical_prices = PriceService.get_historical_prices(symbol, exchange, days)
+    # Try to fetch from yfinance; the service keeps Decimals and dates for the
+    # backfill path, so convert them here in the same pass that builds the list
+    historical_prices = [
+        {
+            'date': str(p['date']),
+            'open': float(p['open']),
+            'high': float(p['high']),
+            'low': float(p['low']),
+            'close': float(p['close']),
+            'volume': p['volume']
+        }
+        for p in PriceService.get_historical_prices(symbol, exchange, days)
+    ]
 
     if not historical_prices:
-        # Fall back to database
-        historical_prices = db.query(PriceHistory).filter(
-            PriceHistory.symbol == symbol,
-            PriceHistory.exchange == exchange
-        ).order_by(PriceHistory.date.desc()).limit(days).all()
-
+        # Fall back to database (price columns already read back as floats)
         historical_prices = [
             {
                 'date': str(p.date),
-                'open': float(p.open) if p.open else None,
-                'high': float(p.high) if p.high else None,
-                'low': float(p.low) if p.low else None,
-                'close': float(p.close),
+                'open': p.open,
+                'high': p.high,
+                'low': p.low,
+                'close': p.close,
                 'volume': p.volume
             }
-            for p in historical_prices
+            for p in db.query(PriceHistory).filter(
+                PriceHistory.symbol == symbol,
+                PriceHistory.exchange == exchange
+            ).order_by(PriceHistory.date.desc()).limit(days)
         ]
 
-    # Convert dates to strings for JSON serialization
-    for price in historical_prices:
-        if isinstance(price['date'], date):
-            price['date'] = str(price['date'])
-        if isinstance(price['open'], Decimal):
-            price['open'] = float(price['open'])
-        if isinstance(price['high'], Decimal):
-            price['high'] = float(price['high'])
-        if isinstance(price['low'], Decimal):
-            price['low'] = float(price['low'])
-        if isinstance(price['close'], Decimal):
-            price['close'] = float(price['close'])
-
     return {
         "symbol": symbol,
         "exchange": exchange,
@@ -3,14 +3,15 @@ Portfolio Snapshots Router
 
 API endpoints for portfolio value snapshots and historical data.
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from datetime import date, timedelta
 from decimal import Decimal
 from typing import List, Optional
 import logging
 
-from ..database import get_db
+from ..database import get_db, get_write_db
 from ..models.portfolio_snapshot import PortfolioSnapshot
 from ..schemas.snapshot import (
     PortfolioSnapshotResponse,
@@ -27,7 +28,7 @@ router = APIRouter(tags=["snapshots"])
 @router.post("/snapshots/create", response_model=PortfolioSnapshotResponse)
 def create_snapshot(
     snapshot_date: Optional[date] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_write_db)
 ):
     """
     Create a portfolio snapshot for the specified date (or today).
@@ -50,8 +51,9 @@ def create_snapshot(
 @router.get("/snapshots/latest", response_model=PortfolioSnapshotResponse)
 def get_latest_snapshot(db: Session = Depends(get_db)):
     """Get the most recent portfolio snapshot"""
-    snapshot = db.query(SnapshotService).order_by(
-        SnapshotService.snapshot_date.desc()
+    # Walks the snapshot_date index backwards, so this is a single row read
+    snapshot = db.query(PortfolioSnapshot).order_by(
+        PortfolioSnapshot.snapshot_date.desc()
     ).first()
 
     if not snapshot:
@@ -77,27 +79,47 @@ def get_snapshot_by_date(
     return snapshot
 
 
+def history_json(history: PortfolioHistoryResponse) -> Response:
+    """
+    Serialize a history response in one pydantic-core pass. Returning the model
+    itself would have FastAPI validate every snapshot against response_model a
+    second time before encoding it; the JSON is the same either way.
+    """
+    return Response(content=history.model_dump_json(), media_type="application/json")
+
+
 @router.get("/portfolio/history", response_model=PortfolioHistoryResponse)
 async def get_portfolio_history(
     days: int = Query(default=30, ge=1, le=3650, description="Number of days of history"),
+    detail: bool = Query(default=True, description="Include the snapshot rows; false returns only the summary"),
     db: Session = Depends(get_db)
 ):
     """
     Get portfolio value history for the specified number of days.
 
     Returns:
-    - List of snapshots
+    - List of snapshots (omitted when detail=false)
     - Date range
     - Current value and change from start
     """
     try:
-        # Get snapshots for the requested period
-        snapshots = SnapshotService.get_recent_snapshots(db, days)
-
-        if not snapshots:
+        # Get snapshots for the requested period, or just their range and first value
+        if detail:
+            snapshots = SnapshotService.get_recent_snapshots(db, days)
+            history = (
+                snapshots[0].snapshot_date,
+                snapshots[-1].snapshot_date,
+                snapshots[0].total_value_cad,
+                len(snapshots)
+            ) if snapshots else None
+        else:
+            snapshots = []
+            history = SnapshotService.get_history_aggregate(db, days)
+
+        if history is None:
             # No snapshots exist yet, return empty history
             summary = await calculate_portfolio_summary(db)
-            return PortfolioHistoryResponse(
+            return history_json(PortfolioHistoryResponse(
                 snapshots=[],
                 start_date=date.today() - timedelta(days=days),
                 end_date=date.today(),
@@ -105,29 +127,29 @@ async def get_portfolio_history(
                 current_value=summary['total_value_cad'],
                 value_change=Decimal('0'),
                 value_change_pct=Decimal('0')
-            )
+            ))
+        start_date, end_date, first_value, total_days = history
 
         # Get current portfolio value
         summary = await calculate_portfolio_summary(db)
         current_value = Decimal(str(summary['total_value_cad']))
 
         # Calculate change from first snapshot
-        first_snapshot = snapshots[0]
-        value_change = current_value - first_snapshot.total_value_cad
+        value_change = current_value - first_value
         value_change_pct = Decimal('0')
 
-        if first_snapshot.total_value_cad > 0:
-            value_change_pct = (value_change / first_snapshot.total_value_cad) * Decimal('100')
+        if first_value > 0:
+            value_change_pct = (value_change / first_value) * Decimal('100')
 
-        return PortfolioHistoryResponse(
+        return history_json(PortfolioHistoryResponse(
             snapshots=snapshots,
-            start_date=first_snapshot.snapshot_date,
-            end_date=snapshots[-1].snapshot_date,
-            total_days=len(snapshots),
+            start_date=start_date,
+            end_date=end_date,
+            total_days=total_days,
             current_value=current_value,
             value_change=value_change,
             value_change_pct=value_change_pct
-        )
+        ))
 
     except Exception as e:
         logger.error(f"Error getting portfolio history: {e}")
@@ -138,7 +160,7 @@ async def get_portfolio_history(
 def backfill_snapshots(
     start_date: date = Query(..., description="Start date for backfill"),
     end_date: Optional[date] = Query(None, description="End date (defaults to today)"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_write_db)
 ):
     """
     Backfill portfolio snapshots for a date range.
@@ -163,7 +185,7 @@ def backfill_snapshots(
 
 
 @router.delete("/snapshots/clear-all")
-def clear_all_snapshots(db: Session = Depends(get_db)):
+def clear_all_snapshots(db: Session = Depends(get_write_db)):
     """
     Delete all portfolio snapshots.
 
@@ -174,7 +196,13 @@ def clear_all_snapshots(db: Session = Depends(get_db)):
         Number of snapshots deleted
     """
     try:
-        count = db.query(PortfolioSnapshot).delete()
+        # One unfiltered DELETE (SQLite runs it as its truncate optimization); nothing
+        # is loaded into the session, so there is nothing to synchronize
+        if db.get_bind().dialect.name == "postgresql":
+            count = db.query(PortfolioSnapshot).count()
+            db.execute(text("TRUNCATE TABLE portfolio_snapshots RESTART IDENTITY"))
+        else:
+            count = db.query(PortfolioSnapshot).delete(synchronize_session=False)
         db.commit()
         logger.info(f"Deleted {count} snapshots")
         return {
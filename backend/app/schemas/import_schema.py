@@ -6,6 +6,7 @@ from typing import Optional, List, Literal
 from datetime import date
 from decimal import Decimal
 from enum import Enum
+from functools import cached_property
 
 
 class ImportPlatform(str, Enum):
@@ -33,12 +34,13 @@ class ParsedTransaction(BaseModel):
     raw_description: Optional[str] = None
 
     # For deduplication
-    @property
+    @cached_property
     def dedup_key(self) -> str:
         """Generate a unique key for deduplication.
 
         Normalizes decimal values to remove trailing zeros for consistent comparison
         with database values (which may have trailing zeros from Numeric columns).
+        Computed once per transaction; the fields aren't modified after parsing.
         """
         return f"{self.date}|{self.symbol}|{self.transaction_type}|{self.quantity.normalize()}|{self.price_per_share.normalize()}"
 
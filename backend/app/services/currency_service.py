@@ -1,13 +1,21 @@
+import asyncio
 import httpx
-from typing import Dict, Optional
-from datetime import datetime, timedelta, date
+from typing import Dict, Iterable, Optional, Set, Tuple
+from datetime import timedelta, date
 from decimal import Decimal
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_upsert
 import logging
 from ..models.price import ExchangeRate
+from ..utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# At most one stored rate per pair per day (uix_currencies_date); later inserts are no-ops
+_RATE_INSERT = sqlite_upsert(ExchangeRate.__table__).on_conflict_do_nothing(
+    index_elements=["from_currency", "to_currency", "date"]
+)
+
 
 class CurrencyService:
     """Service for handling currency conversions"""
@@ -15,9 +23,19 @@ class CurrencyService:
     # Exchange rate API (free tier)
     API_URL = "https://api.exchangerate-api.com/v4/latest/{}"
 
-    # Cache for rates
-    _rate_cache: Dict[str, Dict] = {}
+    # Long-lived clients so cache misses reuse a pooled, already-open connection to the
+    # rate API instead of a fresh TCP + TLS handshake each time; closed on app shutdown
+    _http_limits = httpx.Limits(max_connections=10, max_keepalive_connections=5)
+    _async_client = httpx.AsyncClient(timeout=10.0, limits=_http_limits)
+    _client = httpx.Client(timeout=10.0, limits=_http_limits)
+
+    # Cache for rates ("FROM:TO" -> rate); bounded, and entries expire on their own
     _cache_duration = timedelta(hours=24)
+    _rate_cache = TTLCache(maxsize=128, ttl=_cache_duration.total_seconds())
+    # Lookups that fell through to the approximate rates (or found nothing), remembered
+    # briefly so concurrent requests don't each retry the DB and a 10s API call
+    _fallback_cache = TTLCache(maxsize=64, ttl=300)
+    _MISSING = object()
 
     # Fallback rates for common currencies (used to avoid slow API calls)
     FALLBACK_RATES = {
@@ -38,104 +56,80 @@ class CurrencyService:
         if from_currency == to_currency:
             return Decimal("1.0")
 
-        # Check database cache first
-        today = date.today()
-        cached_rate = db.query(ExchangeRate).filter(
-            ExchangeRate.from_currency == from_currency,
-            ExchangeRate.to_currency == to_currency,
-            ExchangeRate.date == today
-        ).first()
-
-        if cached_rate:
-            logger.info(f"Using cached exchange rate {from_currency} -> {to_currency}: {cached_rate.rate}")
-            return cached_rate.rate
-
-        # Check memory cache
+        # Check memory cache first, then reload today's rates from the database
         cache_key = f"{from_currency}:{to_currency}"
-        if cache_key in cls._rate_cache:
-            cached = cls._rate_cache[cache_key]
-            if datetime.now() - cached['timestamp'] < cls._cache_duration:
-                return cached['rate']
+        cached = cls._rate_cache.get(cache_key)
+        if cached is None and cls.warm_today(db):
+            cached = cls._rate_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Using cached exchange rate {from_currency} -> {to_currency}: {cached}")
+            return cached
 
         # Fetch from API
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(cls.API_URL.format(from_currency), timeout=10.0)
-                response.raise_for_status()
-                data = response.json()
-
-                if 'rates' in data and to_currency in data['rates']:
-                    rate = Decimal(str(data['rates'][to_currency]))
-
-                    # Cache in memory
-                    cls._rate_cache[cache_key] = {
-                        'rate': rate,
-                        'timestamp': datetime.now()
-                    }
-
-                    # Cache in database
-                    db_rate = ExchangeRate(
-                        from_currency=from_currency,
-                        to_currency=to_currency,
-                        rate=rate,
-                        date=today
-                    )
-                    db.add(db_rate)
-                    db.commit()
-
-                    logger.info(f"Fetched exchange rate {from_currency} -> {to_currency}: {rate}")
-                    return rate
-                else:
-                    logger.warning(f"Currency {to_currency} not found in rates")
-                    return None
-
-        except Exception as e:
-            logger.error(f"Error fetching exchange rate {from_currency} -> {to_currency}: {str(e)}")
+        rate = await cls._fetch_rate(from_currency, to_currency)
+        if rate is None:
             return None
 
+        # Cache in memory
+        cls._remember_rate(from_currency, to_currency, rate)
+
+        # Cache in database
+        db.execute(_RATE_INSERT, {
+            "from_currency": from_currency,
+            "to_currency": to_currency,
+            "rate": rate,
+            "date": date.today()
+        })
+        db.commit()
+        return rate
+
     @classmethod
-    def get_exchange_rate_sync(cls, from_currency: str, to_currency: str, db: Session) -> Optional[Decimal]:
+    def get_exchange_rate_sync(
+        cls,
+        from_currency: str,
+        to_currency: str,
+        db: Session,
+        check_db: bool = True
+    ) -> Optional[Decimal]:
         """
         Synchronous version of get_exchange_rate.
         Uses in-memory cache first, then database, then API, then fallback rates.
+        check_db=False skips the database step, for callers that have just reloaded it.
         """
         if from_currency == to_currency:
             return Decimal("1.0")
 
         # Check in-memory cache FIRST (fastest, no DB query)
         cache_key = f"{from_currency}:{to_currency}"
-        if cache_key in cls._rate_cache:
-            cached = cls._rate_cache[cache_key]
-            if datetime.now() - cached['timestamp'] < cls._cache_duration:
-                logger.info(f"Using cached exchange rate {from_currency} -> {to_currency}: {cached['rate']}")
-                return cached['rate']
+        cached = cls._rate_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Using cached exchange rate {from_currency} -> {to_currency}: {cached}")
+            return cached
+
+        recent_fallback = cls._fallback_cache.get(cache_key, cls._MISSING)
+        if recent_fallback is not cls._MISSING:
+            return recent_fallback
 
         # For INR, use fallback rates to avoid slow API calls during requests
         # This is acceptable because INR rates don't change dramatically intraday
         fallback_key = f"{from_currency}:{to_currency}"
         if fallback_key in cls.FALLBACK_RATES:
             rate = cls.FALLBACK_RATES[fallback_key]
-            cls._rate_cache[cache_key] = {'rate': rate, 'timestamp': datetime.now()}
+            cls._rate_cache[cache_key] = rate
             logger.info(f"Using fallback exchange rate {from_currency} -> {to_currency}: {rate}")
             return rate
 
-        # Check database cache
+        # Check database cache (reloads every rate stored today, not just this pair)
         today = date.today()
-        cached_rate = db.query(ExchangeRate).filter(
-            ExchangeRate.from_currency == from_currency,
-            ExchangeRate.to_currency == to_currency,
-            ExchangeRate.date == today
-        ).first()
-
-        if cached_rate:
-            # Populate in-memory cache
-            cls._rate_cache[cache_key] = {'rate': cached_rate.rate, 'timestamp': datetime.now()}
-            logger.info(f"Using DB cached exchange rate {from_currency} -> {to_currency}: {cached_rate.rate}")
-            return cached_rate.rate
+        if check_db and cls.warm_today(db):
+            cached = cls._rate_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Using DB cached exchange rate {from_currency} -> {to_currency}: {cached}")
+                return cached
 
         # Fetch from API synchronously (only for non-INR currencies now)
         try:
-            response = httpx.get(cls.API_URL.format(from_currency), timeout=10.0)
+            response = cls._client.get(cls.API_URL.format(from_currency))
             response.raise_for_status()
             data = response.json()
 
@@ -143,24 +137,16 @@ class CurrencyService:
                 rate = Decimal(str(data['rates'][to_currency]))
 
                 # Cache in memory
-                cache_key = f"{from_currency}:{to_currency}"
-                cls._rate_cache[cache_key] = {
-                    'rate': rate,
-                    'timestamp': datetime.now()
-                }
-
-                # Cache in database (flush only, let caller commit)
-                db_rate = ExchangeRate(
-                    from_currency=from_currency,
-                    to_currency=to_currency,
-                    rate=rate,
-                    date=today
-                )
-                db.add(db_rate)
-                try:
-                    db.flush()
-                except Exception:
-                    db.rollback()  # Rate might already exist, that's OK
+                cls._remember_rate(from_currency, to_currency, rate)
+
+                # Cache in database (no commit, let caller commit); a rate another
+                # request already stored today is kept rather than aborting the transaction
+                db.execute(_RATE_INSERT, {
+                    "from_currency": from_currency,
+                    "to_currency": to_currency,
+                    "rate": rate,
+                    "date": today
+                })
 
                 logger.info(f"Fetched exchange rate {from_currency} -> {to_currency}: {rate}")
                 return rate
@@ -184,11 +170,167 @@ class CurrencyService:
         if key in approximate_rates:
             rate = approximate_rates[key]
             logger.warning(f"Using fallback rate for {key}: {rate}")
+            cls._fallback_cache[key] = rate
             return rate
 
         logger.error(f"No exchange rate available for {key}")
+        cls._fallback_cache[key] = None
         return None
 
+    @classmethod
+    def _remember_rate(cls, from_currency: str, to_currency: str, rate: Decimal):
+        """Cache a fetched rate and its inverse, so the reverse lookup needs no API call."""
+        cls._rate_cache[f"{from_currency}:{to_currency}"] = rate
+        if rate:
+            cls._rate_cache[f"{to_currency}:{from_currency}"] = Decimal(1) / rate
+
+    @classmethod
+    def warm_today(cls, db: Session) -> int:
+        """
+        Load every rate stored for today into the memory cache with one query.
+        Called at startup and on cache misses; returns the number of rates loaded.
+        """
+        rows = db.query(
+            ExchangeRate.from_currency, ExchangeRate.to_currency, ExchangeRate.rate
+        ).filter(ExchangeRate.date == date.today()).all()
+        for from_currency, to_currency, rate in rows:
+            cls._rate_cache[f"{from_currency}:{to_currency}"] = rate
+        return len(rows)
+
+    @classmethod
+    def get_exchange_rate_pairs(
+        cls,
+        pairs: Iterable[Tuple[str, str]],
+        db: Session,
+        fetch_missing: bool = True
+    ) -> Dict[Tuple[str, str], Decimal]:
+        """
+        Get rates for several (from, to) pairs with at most one DB query.
+        Same lookup order as get_exchange_rate_sync; pairs with no rate are omitted.
+        With fetch_missing=False, pairs not in memory or the DB are left out instead
+        of going to the API.
+        """
+        rates = {}
+        remaining = set()
+
+        for pair in pairs:
+            from_currency, to_currency = pair
+            if from_currency == to_currency:
+                rates[pair] = Decimal("1.0")
+                continue
+
+            cache_key = f"{from_currency}:{to_currency}"
+            cached = cls._rate_cache.get(cache_key)
+            if cached is not None:
+                rates[pair] = cached
+            elif cache_key in cls.FALLBACK_RATES:
+                rate = cls.FALLBACK_RATES[cache_key]
+                cls._rate_cache[cache_key] = rate
+                rates[pair] = rate
+            else:
+                remaining.add(pair)
+
+        if not remaining:
+            return rates
+
+        # One query for every pair not already resolved in memory
+        if cls.warm_today(db):
+            for pair in list(remaining):
+                cached = cls._rate_cache.get(f"{pair[0]}:{pair[1]}")
+                if cached is not None:
+                    rates[pair] = cached
+                    remaining.discard(pair)
+
+        if not fetch_missing:
+            return rates
+
+        # Anything still missing goes through the API / fallback path; today's DB
+        # rates were loaded above, so don't query them again per pair
+        for from_currency, to_currency in remaining:
+            rate = cls.get_exchange_rate_sync(from_currency, to_currency, db, check_db=False)
+            if rate:
+                rates[(from_currency, to_currency)] = rate
+
+        return rates
+
+    @classmethod
+    def get_exchange_rates_bulk(cls, currencies: Set[str], to_currency: str, db: Session) -> Dict[str, Decimal]:
+        """Get rates from several currencies to one target; see get_exchange_rate_pairs."""
+        pair_rates = cls.get_exchange_rate_pairs(((c, to_currency) for c in currencies), db)
+        return {from_currency: rate for (from_currency, _), rate in pair_rates.items()}
+
+    @classmethod
+    async def get_exchange_rates_bulk_async(cls, currencies: Set[str], to_currency: str, db: Session) -> Dict[str, Decimal]:
+        """
+        get_exchange_rates_bulk for handlers running on the event loop: memory and
+        DB lookups are the same, but rates still missing are fetched concurrently
+        with the shared AsyncClient instead of a blocking request per currency.
+        """
+        pair_rates = cls.get_exchange_rate_pairs(((c, to_currency) for c in currencies), db, fetch_missing=False)
+        rates = {from_currency: rate for (from_currency, _), rate in pair_rates.items()}
+
+        to_fetch = []
+        for from_currency in currencies:
+            if from_currency in rates:
+                continue
+            recent_fallback = cls._fallback_cache.get(f"{from_currency}:{to_currency}", cls._MISSING)
+            if recent_fallback is cls._MISSING:
+                to_fetch.append(from_currency)
+            elif recent_fallback:
+                rates[from_currency] = recent_fallback
+
+        if not to_fetch:
+            return rates
+
+        fetched = await asyncio.gather(*[cls._fetch_rate(c, to_currency) for c in to_fetch])
+        today = date.today()
+        stored = False
+        for from_currency, rate in zip(to_fetch, fetched):
+            if rate is None:
+                # Same as the sync path: remember the miss briefly instead of retrying
+                logger.error(f"No exchange rate available for {from_currency}:{to_currency}")
+                cls._fallback_cache[f"{from_currency}:{to_currency}"] = None
+                continue
+            cls._remember_rate(from_currency, to_currency, rate)
+            db.execute(_RATE_INSERT, {
+                "from_currency": from_currency,
+                "to_currency": to_currency,
+                "rate": rate,
+                "date": today
+            })
+            stored = True
+            rates[from_currency] = rate
+
+        # Callers don't commit after an FX lookup, so keep the fetched rates here
+        if stored:
+            db.commit()
+
+        return rates
+
+    @classmethod
+    async def _fetch_rate(cls, from_currency: str, to_currency: str) -> Optional[Decimal]:
+        """One rate from the API via the shared AsyncClient, or None if it can't be had."""
+        try:
+            response = await cls._async_client.get(cls.API_URL.format(from_currency))
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            logger.warning(f"API call failed for {from_currency} -> {to_currency}: {e}")
+            return None
+
+        if 'rates' not in data or to_currency not in data['rates']:
+            logger.warning(f"Currency {to_currency} not found in API response")
+            return None
+        rate = Decimal(str(data['rates'][to_currency]))
+        logger.info(f"Fetched exchange rate {from_currency} -> {to_currency}: {rate}")
+        return rate
+
+    @classmethod
+    async def aclose(cls):
+        """Close the shared HTTP clients."""
+        cls._client.close()
+        await cls._async_client.aclose()
+
     @classmethod
     def convert_amount(cls, amount: Decimal, from_currency: str, to_currency: str, db: Session) -> Optional[Decimal]:
         """Convert an amount from one currency to another"""
@@ -174,8 +174,9 @@ def backfill_history(db: Session, start_date: Optional[date] = None, end_date: O
     ).all()
     
     # Get exchange rates
-    inr_rate = CurrencyService.get_exchange_rate_sync("INR", "CAD", db) or Decimal("0.0151")
-    usd_rate = CurrencyService.get_exchange_rate_sync("USD", "CAD", db) or Decimal("1.44")
+    fx = CurrencyService.get_exchange_rates_bulk({"INR", "USD"}, "CAD", db)
+    inr_rate = fx.get("INR") or Decimal("0.0151")
+    usd_rate = fx.get("USD") or Decimal("1.44")
     
     snapshots_created = 0
     current_date = start_date
@@ -9,9 +9,11 @@ import csv
 import io
 import re
 import base64
+import codecs
+import itertools
 from datetime import datetime, date
 from decimal import Decimal, InvalidOperation
-from typing import List, Optional, Tuple
+from typing import List, Optional, TextIO, Tuple, Union
 import logging
 
 from sqlalchemy.orm import Session
@@ -28,6 +30,12 @@ from ..schemas.import_schema import (
 
 logger = logging.getLogger(__name__)
 
+# How much of a file the preview endpoints look at before deciding it can't be CSV
+CSV_SNIFF_SIZE = 4096
+# Slice size for validating decoded base64 as UTF-8 without building the full string
+_UTF8_CHECK_CHUNK = 1 << 20
+_CONTROL_CHARS = re.compile(r'[\x00-\x08\x0e-\x1f]')
+
 
 # Symbol mappings for standardization
 SYMBOL_MAPPINGS = {
@@ -110,18 +118,54 @@ class ImportService:
         ]
 
     @staticmethod
-    def decode_file_content(content: str) -> str:
-        """Decode base64 content if needed, otherwise return as-is."""
+    def decode_file_content(content: str) -> Union[str, TextIO]:
+        """
+        Decode base64 content if needed, otherwise return as-is.
+
+        Base64 input comes back as a UTF-8 text stream over the decoded bytes, so the
+        parsers read it incrementally instead of from a second full-size string.
+        """
         try:
-            # Try to decode as base64
-            decoded = base64.b64decode(content).decode('utf-8')
-            return decoded
+            # Strict alphabet check once line breaks are removed (MIME encoders wrap at
+            # 76 columns): plain CSV fails on its first comma instead of being decoded in full
+            raw = base64.b64decode(''.join(content.split()), validate=True)
+            # Reject non-UTF-8 here rather than partway through parsing; decoded in
+            # slices so no full-size string is built
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            view = memoryview(raw)
+            for start in range(0, len(raw), _UTF8_CHECK_CHUNK):
+                decoder.decode(view[start:start + _UTF8_CHECK_CHUNK])
+            decoder.decode(b'', final=True)
         except Exception:
             # Already plain text
             return content
+        return io.TextIOWrapper(io.BytesIO(raw), encoding='utf-8', newline='')
+
+    @staticmethod
+    def content_head(content: str) -> str:
+        """The start of request content as text, base64-decoding just that prefix if needed."""
+        head = content[:CSV_SNIFF_SIZE]
+        compact = ''.join(head.split())
+        try:
+            # Whole 4-character groups only, since the prefix rarely ends on one
+            raw = base64.b64decode(compact[:len(compact) // 4 * 4], validate=True)
+        except Exception:
+            return head
+        return raw.decode('utf-8', errors='ignore')
+
+    @staticmethod
+    def csv_head_problem(head: str) -> Optional[str]:
+        """Cheap check on the start of a file; returns why it can't be a CSV, or None."""
+        if not head.strip():
+            return "File is empty"
+        if _CONTROL_CHARS.search(head):
+            return "File appears to be binary, not CSV"
+        if ',' not in head and ';' not in head:
+            return "File does not look like a CSV (no delimiters found)"
+        return None
 
     @staticmethod
-    def parse_td_direct_csv(content: str, account_type: Optional[str] = None) -> Tuple[List[ParsedTransaction], List[str]]:
+    def parse_td_direct_csv(content: Union[str, TextIO], account_type: Optional[str] = None) -> Tuple[List[ParsedTransaction], List[str]]:
         """
         Parse TD Direct Investing CSV export.
 
@@ -134,28 +178,31 @@ class ImportService:
 
         Actions to import: BUY, SELL
         Note: Other actions like TXPDDV (dividends), DIV, WHTX02 are skipped.
+
+        content may be a string or a text-mode file, which is read line by line.
         """
         transactions = []
         warnings = []
 
-        lines = content.strip().split('\n')
+        lines = io.StringIO(content.strip()) if isinstance(content, str) else content
 
         # Skip header lines and find the actual CSV data
         # Handle both "Trade Date," and potential whitespace
         data_start = 0
+        header = None
         for i, line in enumerate(lines):
             stripped = line.strip()
             if stripped.startswith("Trade Date,") or stripped.startswith("Trade Date\t"):
                 data_start = i
+                header = line
                 break
 
         if data_start == 0:
             warnings.append("Could not find CSV header row. Expected header starting with 'Trade Date,'")
             return transactions, warnings
 
-        # Parse CSV starting from header row
-        csv_content = '\n'.join(lines[data_start:])
-        reader = csv.DictReader(io.StringIO(csv_content))
+        # Parse CSV starting from header row; the remaining lines are consumed as the reader goes
+        reader = csv.DictReader(itertools.chain([header], lines))
 
         # Track skipped actions for better user feedback
         skipped_actions = {}
@@ -244,18 +291,20 @@ class ImportService:
         return transactions, warnings
 
     @staticmethod
-    def parse_wealthsimple_csv(content: str, account_type: Optional[str] = None) -> Tuple[List[ParsedTransaction], List[str]]:
+    def parse_wealthsimple_csv(content: Union[str, TextIO], account_type: Optional[str] = None) -> Tuple[List[ParsedTransaction], List[str]]:
         """
         Parse Wealthsimple monthly statement CSV.
 
         Format:
         date,transaction,description,amount[,balance,currency]
         2025-03-12,BUY,"NVDA - NVIDIA Corp.: Bought 5.0000 shares (executed at 2025-03-12), FX Rate: 1.4644",-1500.00
+
+        content may be a string or a text-mode file, which is read line by line.
         """
         transactions = []
         warnings = []
 
-        reader = csv.DictReader(io.StringIO(content))
+        reader = csv.DictReader(io.StringIO(content) if isinstance(content, str) else content)
 
         # Track skipped transaction types for better user feedback
         skipped_types = {}
@@ -389,12 +438,15 @@ class ImportService:
 
     @staticmethod
     def parse_file(
-        content: str,
+        content: Union[str, TextIO],
         platform: ImportPlatform,
         account_type: Optional[str] = None
     ) -> Tuple[List[ParsedTransaction], List[str]]:
-        """Parse file content based on platform."""
-        decoded_content = ImportService.decode_file_content(content)
+        """Parse file content (a possibly base64-encoded string, or an open text file) based on platform."""
+        if isinstance(content, str):
+            decoded_content = ImportService.decode_file_content(content)
+        else:
+            decoded_content = content
 
         if platform == ImportPlatform.TD_DIRECT:
             return ImportService.parse_td_direct_csv(decoded_content, account_type)
@@ -403,27 +455,53 @@ class ImportService:
         else:
             return [], [f"Unsupported platform: {platform}"]
 
+    @staticmethod
+    def existing_dedup_keys(db: Session, transactions: List[ParsedTransaction]) -> set:
+        """
+        Dedup keys of stored transactions that could collide with the parsed ones:
+        one query, limited to the file's symbols and date range.
+        """
+        if not transactions:
+            return set()
+
+        dates = [t.date for t in transactions]
+        existing = db.query(
+            Transaction.transaction_date,
+            Transaction.symbol,
+            Transaction.transaction_type,
+            Transaction.quantity,
+            Transaction.price_per_share,
+        ).filter(
+            Transaction.symbol.in_({t.symbol for t in transactions}),
+            Transaction.transaction_date.between(min(dates), max(dates))
+        )
+        # Normalize decimals to remove trailing zeros for consistent comparison
+        return {
+            f"{txn_date}|{symbol}|{txn_type}|{quantity.normalize()}|{price.normalize()}"
+            for txn_date, symbol, txn_type, quantity, price in existing
+        }
+
     @staticmethod
     def preview_import(
         db: Session,
-        content: str,
+        content: Union[str, TextIO],
         platform: ImportPlatform,
         account_type: Optional[str] = None
     ) -> ImportPreviewResponse:
         """Preview import without saving to database."""
         transactions, warnings = ImportService.parse_file(content, platform, account_type)
 
-        # Get existing holdings
-        existing_holdings = db.query(Holding).filter(Holding.is_active == True).all()
-        existing_symbols = {h.symbol for h in existing_holdings}
+        # Get existing holdings for the symbols in this file
+        symbols = {t.symbol for t in transactions}
+        existing_symbols = {
+            symbol for (symbol,) in db.query(Holding.symbol).filter(
+                Holding.is_active == True,
+                Holding.symbol.in_(symbols)
+            )
+        }
 
         # Get existing transactions for deduplication
-        # Normalize decimals to remove trailing zeros for consistent comparison
-        existing_transactions = db.query(Transaction).all()
-        existing_dedup_keys = {
-            f"{t.transaction_date}|{t.symbol}|{t.transaction_type}|{t.quantity.normalize()}|{t.price_per_share.normalize()}"
-            for t in existing_transactions
-        }
+        existing_dedup_keys = ImportService.existing_dedup_keys(db, transactions)
 
         # Categorize symbols and count duplicates
         new_symbols = set()
@@ -454,14 +532,27 @@ class ImportService:
     @staticmethod
     def import_transactions(
         db: Session,
-        content: str,
+        content: Union[str, TextIO],
         platform: ImportPlatform,
         account_type: Optional[str] = None,
         skip_duplicates: bool = True
     ) -> ImportResult:
         """Import transactions into the database."""
         transactions, warnings = ImportService.parse_file(content, platform, account_type)
+        return ImportService.import_parsed_transactions(
+            db, transactions, warnings, platform, account_type, skip_duplicates
+        )
 
+    @staticmethod
+    def import_parsed_transactions(
+        db: Session,
+        transactions: List[ParsedTransaction],
+        warnings: List[str],
+        platform: ImportPlatform,
+        account_type: Optional[str] = None,
+        skip_duplicates: bool = True
+    ) -> ImportResult:
+        """Save already-parsed transactions (see parse_file) to the database."""
         if not transactions:
             return ImportResult(
                 success=False,
@@ -474,12 +565,7 @@ class ImportService:
             )
 
         # Get existing transactions for deduplication
-        # Normalize decimals to remove trailing zeros for consistent comparison
-        existing_transactions = db.query(Transaction).all()
-        existing_dedup_keys = {
-            f"{t.transaction_date}|{t.symbol}|{t.transaction_type}|{t.quantity.normalize()}|{t.price_per_share.normalize()}"
-            for t in existing_transactions
-        }
+        existing_dedup_keys = ImportService.existing_dedup_keys(db, transactions)
 
         # Track results
         imported_count = 0
@@ -495,8 +581,15 @@ class ImportService:
         # This allows same symbol in multiple accounts (e.g., XEQT in both TFSA and FHSA)
         holdings_map = {}  # (symbol, account_type) -> holding
 
-        # Get existing holdings keyed by (symbol, account_type)
-        existing_holdings = {(h.symbol, h.account_type): h for h in db.query(Holding).all()}
+        # Get existing holdings for the symbols in this file, keyed by (symbol, account_type)
+        existing_holdings = {
+            (h.symbol, h.account_type): h
+            for h in db.query(Holding).filter(Holding.symbol.in_({t.symbol for t in transactions}))
+        }
+
+        # Transactions are collected here and inserted in one batch once new holdings have IDs
+        new_transactions = []  # (holding, parsed transaction)
+        import_notes = f"Imported from {platform.value}" + (f" ({account_type})" if account_type else "")
 
         for t in transactions:
             holding_key = (t.symbol, t.account_type)
@@ -532,7 +625,6 @@ class ImportService:
                             is_active=True,
                         )
                         db.add(holding)
-                        db.flush()  # Get ID
                         holdings_map[holding_key] = holding
                         existing_holdings[holding_key] = holding
                         holdings_created += 1
@@ -557,18 +649,8 @@ class ImportService:
                         warnings.append(f"Sell quantity ({t.quantity}) exceeds holding quantity ({holding.quantity}) for {t.symbol}")
                         holding.quantity = Decimal("0")
 
-                # Create transaction record
-                db_transaction = Transaction(
-                    holding_id=holding.id,
-                    symbol=t.symbol,
-                    transaction_type=t.transaction_type,
-                    quantity=t.quantity,
-                    price_per_share=t.price_per_share,
-                    fees=t.fees,
-                    transaction_date=t.date,
-                    notes=f"Imported from {platform.value}" + (f" ({account_type})" if account_type else ""),
-                )
-                db.add(db_transaction)
+                # Queue transaction record
+                new_transactions.append((holding, t))
                 imported_count += 1
 
                 # Add to existing dedup keys to prevent duplicates within same import
@@ -584,6 +666,21 @@ class ImportService:
                 holding.is_active = False
 
         try:
+            # One flush gives every new holding its ID, then all transactions go in as one executemany
+            db.flush()
+            db.bulk_insert_mappings(Transaction, [
+                {
+                    "holding_id": holding.id,
+                    "symbol": t.symbol,
+                    "transaction_type": t.transaction_type,
+                    "quantity": t.quantity,
+                    "price_per_share": t.price_per_share,
+                    "fees": t.fees,
+                    "transaction_date": t.date,
+                    "notes": import_notes,
+                }
+                for holding, t in new_transactions
+            ])
             db.commit()
         except Exception as e:
             db.rollback()
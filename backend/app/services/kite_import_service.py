@@ -8,7 +8,7 @@ import pandas as pd
 import io
 import base64
 from decimal import Decimal
-from typing import List, Dict, Tuple, Optional
+from typing import BinaryIO, Iterable, List, Dict, Tuple, Optional, Union
 from dataclasses import dataclass
 import logging
 
@@ -32,13 +32,13 @@ class KiteImportService:
     """Service for importing Kite (Zerodha) holdings."""
     
     @staticmethod
-    def parse_xlsx_content(content: bytes) -> Tuple[pd.DataFrame, List[str]]:
-        """Parse a single Kite AGTS xlsx file."""
+    def parse_xlsx_content(content: Union[bytes, BinaryIO]) -> Tuple[pd.DataFrame, List[str]]:
+        """Parse a single Kite AGTS xlsx file, given as bytes or an open binary file."""
         warnings = []
         
         try:
-            # Read excel file
-            df = pd.read_excel(io.BytesIO(content), header=None)
+            # Read excel file (file objects are read in place, without a full copy in memory)
+            df = pd.read_excel(io.BytesIO(content) if isinstance(content, bytes) else content, header=None)
             
             # Find the header row containing 'Symbol'
             header_row = None
@@ -116,7 +116,7 @@ class KiteImportService:
         return holdings
     
     @staticmethod
-    def parse_multiple_files(file_contents: List[bytes]) -> Tuple[List[KiteHolding], List[str]]:
+    def parse_multiple_files(file_contents: Iterable[Union[bytes, BinaryIO]]) -> Tuple[List[KiteHolding], List[str]]:
         """Parse multiple AGTS files and return aggregated holdings."""
         all_warnings = []
         dataframes = []
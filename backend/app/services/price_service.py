@@ -160,7 +160,8 @@ class PriceService:
             return results
 
         # Batch download all uncached symbols at once
-        yf_symbols = [item[2] for item in symbols_to_fetch]
+        # (deduped - the same ticker held in several accounts only needs fetching once)
+        yf_symbols = list(dict.fromkeys(item[2] for item in symbols_to_fetch))
         logger.info(f"Batch fetching {len(yf_symbols)} symbols: {yf_symbols}")
 
         try:
@@ -168,9 +169,11 @@ class PriceService:
             # threads=True enables parallel downloading
             # progress=False disables progress bar for cleaner logs
             # auto_adjust=True uses adjusted close prices (default in newer yfinance)
+            # group_by='ticker' keys columns as (ticker, field) so each symbol is one slice
             data = yf.download(
-                yf_symbols,
+                tickers=" ".join(yf_symbols),
                 period='1d',
+                group_by='ticker',
                 progress=False,
                 threads=True,
                 ignore_tz=True,
@@ -184,14 +187,14 @@ class PriceService:
                     results[symbol] = cls.get_current_price(symbol, exchange)
                 return results
 
-            # Process results - yfinance returns MultiIndex columns (field, symbol)
+            # Process results - grouped by ticker, so columns are (symbol, field)
             now = datetime.now()
 
             for symbol, exchange, yf_symbol in symbols_to_fetch:
                 try:
                     # Access close price for this symbol via MultiIndex
-                    if ('Close', yf_symbol) in data.columns:
-                        close_data = data[('Close', yf_symbol)]
+                    if (yf_symbol, 'Close') in data.columns:
+                        close_data = data[(yf_symbol, 'Close')]
                         if not close_data.empty:
                             price_val = close_data.iloc[-1]
                             if pd.notna(price_val):
@@ -3,8 +3,8 @@ Portfolio Snapshot Service
 
 Service for creating and managing daily portfolio value snapshots.
 """
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy.orm import Session, raiseload
+from sqlalchemy import func, select
 from datetime import date, datetime, timedelta
 from decimal import Decimal
 from typing import Optional, List
@@ -112,6 +112,9 @@ class SnapshotService:
         # For historical dates, replay transactions
         is_today = snapshot_date == date.today()
 
+        # One rate lookup per currency rather than two per holding
+        fx = CurrencyService.get_exchange_rates_bulk({h.currency for h in holdings} - {'CAD'}, 'CAD', db)
+
         for holding in holdings:
             if is_today:
                 # Use current holdings data directly
@@ -154,24 +157,13 @@ class SnapshotService:
                 # Calculate market value using historical quantity and price
                 market_value = quantity * price_for_date
 
-            # Convert to CAD
-            if holding.currency != 'CAD':
-                rate = CurrencyService.get_exchange_rate_sync(holding.currency, 'CAD', db)
-                if rate:
-                    market_value_cad = market_value * rate
-                else:
-                    market_value_cad = market_value
+            # Convert to CAD (historical cost is already in holding's currency)
+            rate = fx.get(holding.currency) if holding.currency != 'CAD' else None
+            if rate:
+                market_value_cad = market_value * rate
+                cost_cad = cost * rate
             else:
                 market_value_cad = market_value
-
-            # Use historical cost (already in holding's currency)
-            if holding.currency != 'CAD':
-                rate = CurrencyService.get_exchange_rate_sync(holding.currency, 'CAD', db)
-                if rate:
-                    cost_cad = cost * rate
-                else:
-                    cost_cad = cost
-            else:
                 cost_cad = cost
 
             total_value_cad += market_value_cad
@@ -247,12 +239,17 @@ class SnapshotService:
         end_date: date
     ) -> List[PortfolioSnapshot]:
         """Get all snapshots within a date range"""
-        return db.query(PortfolioSnapshot).filter(
-            and_(
+        # Snapshots are flat rows; raiseload makes any relationship added later fail
+        # loudly instead of lazy-loading once per snapshot during serialization
+        return db.execute(
+            select(PortfolioSnapshot)
+            .options(raiseload('*'))
+            .where(
                 PortfolioSnapshot.snapshot_date >= start_date,
                 PortfolioSnapshot.snapshot_date <= end_date
             )
-        ).order_by(PortfolioSnapshot.snapshot_date).all()
+            .order_by(PortfolioSnapshot.snapshot_date)
+        ).scalars().all()
 
     @staticmethod
     def get_recent_snapshots(db: Session, days: int = 30) -> List[PortfolioSnapshot]:
@@ -261,6 +258,32 @@ class SnapshotService:
         start_date = end_date - timedelta(days=days)
         return SnapshotService.get_snapshots_range(db, start_date, end_date)
 
+    @staticmethod
+    def get_history_aggregate(db: Session, days: int = 30) -> Optional[tuple]:
+        """
+        Summary of the last N days of snapshots without loading them:
+        (first_date, last_date, first_value, count), or None if there are none.
+        """
+        end_date = date.today()
+        start_date = end_date - timedelta(days=days)
+        in_range = (
+            PortfolioSnapshot.snapshot_date >= start_date,
+            PortfolioSnapshot.snapshot_date <= end_date
+        )
+        first_value = select(PortfolioSnapshot.total_value_cad).where(*in_range).order_by(
+            PortfolioSnapshot.snapshot_date
+        ).limit(1).scalar_subquery()
+
+        first_date, last_date, count, first_total = db.query(
+            func.min(PortfolioSnapshot.snapshot_date),
+            func.max(PortfolioSnapshot.snapshot_date),
+            func.count(PortfolioSnapshot.id),
+            first_value
+        ).filter(*in_range).one()
+        if not count:
+            return None
+        return first_date, last_date, first_total, count
+
     @staticmethod
     def get_previous_snapshot(db: Session, reference_date: Optional[date] = None) -> Optional[PortfolioSnapshot]:
         """
@@ -335,12 +358,19 @@ class SnapshotService:
         count = 0
         current_date = start_date
 
+        # Dates that already have a snapshot, in one query rather than one per day
+        existing_dates = set(db.execute(
+            select(PortfolioSnapshot.snapshot_date).where(
+                PortfolioSnapshot.snapshot_date >= start_date,
+                PortfolioSnapshot.snapshot_date <= end_date
+            )
+        ).scalars())
+
         while current_date <= end_date:
             try:
                 # Only create snapshot for business days (Mon-Fri)
                 if current_date.weekday() < 5:  # 0=Monday, 4=Friday
-                    existing = SnapshotService.get_snapshot(db, current_date)
-                    if not existing:
+                    if current_date not in existing_dates:
                         SnapshotService.create_snapshot(db, current_date)
                         count += 1
                         logger.info(f"Created snapshot for {current_date}")